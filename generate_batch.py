@@ -0,0 +1,350 @@
+"""
+Generates several plugin projects from this template at once.
+
+The contexts of the projects are read from a YAML or CSV manifest. A YAML
+manifest is either a list of contexts or a mapping with the contexts in
+plugins and the options shared by all of them in defaults:
+
+    defaults:
+      git_repo_organization: my-organization
+      include_processing: true
+    plugins:
+      - plugin_name: First plugin
+      - plugin_name: Second plugin
+        license: GPL3
+
+A CSV manifest has the option names on the first row and a context on each
+of the other rows. Empty cells get the default values.
+
+All the contexts are validated with the checks of hooks/pre_gen_project.py
+before anything is generated. The projects are generated in a process pool,
+and they share the qgis_plugin_tools mirror of the post-generation hook. The
+generated projects are linted with a single ruff invocation, and a summary
+is printed at the end. The render cache of render_cache.py is enabled for
+the projects, unless COOKIECUTTER_RENDER_CACHE is set to 0.
+
+Usage:
+    python generate_batch.py [--output-dir DIR] [--workers N] [--no-lint] MANIFEST
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import yaml
+from cookiecutter.environment import StrictEnvironment
+from cookiecutter.main import cookiecutter
+from rich.console import Console
+from rich.table import Table
+
+from render_cache import RENDER_CACHE_VARIABLE
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+TEMPLATE_DIR = Path(__file__).parent
+
+LINT_TIMEOUT = 600
+
+TRUE_VALUES = ("true", "yes", "y", "1")
+FALSE_VALUES = ("false", "no", "n", "0")
+
+
+class BatchError(Exception):
+    pass
+
+
+class ManifestFormatError(BatchError):
+    def __init__(self, manifest: Path) -> None:
+        super().__init__(
+            f"{manifest} must be a YAML file with a list of contexts or plugins and defaults, or a CSV file."
+        )
+
+
+class InvalidContextsError(BatchError):
+    def __init__(self, errors: dict[int, list[str]]) -> None:
+        lines = [f"Context {index + 1}: {error}" for index, messages in errors.items() for error in messages]
+        super().__init__("\n".join(["The manifest has invalid contexts:", *lines]))
+        self.errors = errors
+
+
+@dataclass
+class ProjectResult:
+    context: dict[str, Any]
+    project_path: Path | None = None
+    error: str | None = None
+    seconds: float = 0
+    lint: dict[str, list[str]] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=None)
+def cookiecutter_json(template: Path = TEMPLATE_DIR) -> dict[str, Any]:
+    return json.loads((template / "cookiecutter.json").read_text(encoding="utf-8"))
+
+
+@lru_cache(maxsize=None)
+def _environment(template: Path) -> StrictEnvironment:
+    return StrictEnvironment(context={"cookiecutter": cookiecutter_json(template)})
+
+
+@lru_cache(maxsize=None)
+def _template(template: Path, source: str) -> Template:
+    return _environment(template).from_string(source)
+
+
+def render_context(context: dict[str, Any], template: Path = TEMPLATE_DIR) -> dict[str, Any]:
+    """Returns the cookiecutter context of the options, with the defaults of the other options rendered."""
+    defaults = {
+        name: value[0] if isinstance(value, list) else value for name, value in cookiecutter_json(template).items()
+    }
+    rendered: dict[str, Any] = {}
+    # The defaults may refer to the options before them
+    for name, value in {**defaults, **context}.items():
+        if isinstance(value, str) and not name.startswith("_"):
+            value = _template(template, value).render(cookiecutter=rendered)  # noqa: PLW2901
+        rendered[name] = value
+    return rendered
+
+
+def pre_gen_error(context: dict[str, Any], template: Path = TEMPLATE_DIR) -> str | None:
+    """Runs the checks of the pre-generation hook and returns the error it prints, or None if they pass."""
+    hook = (template / "hooks" / "pre_gen_project.py").read_text(encoding="utf-8")
+    source = _template(template, hook).render(cookiecutter=render_context(context, template))
+    namespace: dict[str, Any] = {"__name__": "pre_gen_project"}
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(compile(source, "pre_gen_project.py", "exec"), namespace)  # noqa: S102
+            namespace["main"]()
+    except SystemExit as exc:
+        if exc.code:
+            return output.getvalue().strip() or f"The pre-generation hook exited with {exc.code}"
+    return None
+
+
+def _option_value(default: Any, value: str) -> Any:
+    if isinstance(default, bool) and value.lower() in (*TRUE_VALUES, *FALSE_VALUES):
+        return value.lower() in TRUE_VALUES
+    return value
+
+
+def read_manifest(manifest: Path, template: Path = TEMPLATE_DIR) -> list[dict[str, Any]]:
+    """Returns the contexts of the manifest."""
+    if manifest.suffix.lower() == ".csv":
+        options = cookiecutter_json(template)
+        with manifest.open(encoding="utf-8", newline="") as file:
+            return [
+                {name: _option_value(options.get(name), value) for name, value in row.items() if value}
+                for row in csv.DictReader(file)
+            ]
+
+    content = yaml.safe_load(manifest.read_text(encoding="utf-8"))
+    if isinstance(content, dict):
+        defaults = content.get("defaults") or {}
+        contexts = content.get("plugins")
+    else:
+        defaults, contexts = {}, content
+    if not isinstance(contexts, list) or not all(isinstance(context, dict) for context in contexts):
+        raise ManifestFormatError(manifest)
+    return [{**defaults, **context} for context in contexts]
+
+
+def validate(contexts: list[dict[str, Any]], template: Path = TEMPLATE_DIR) -> None:
+    """Raises InvalidContextsError if any of the contexts is invalid."""
+    options = cookiecutter_json(template)
+    errors: dict[int, list[str]] = {}
+    directories: dict[str, int] = {}
+    for index, context in enumerate(contexts):
+        messages = [f"Unknown option {name}" for name in context if name not in options or name.startswith("__")]
+        for name, value in context.items():
+            choices = options.get(name)
+            if isinstance(choices, list) and value not in choices:
+                messages.append(f"{name} must be one of {', '.join(map(str, choices))}, not {value}")
+        if not messages:
+            error = pre_gen_error(context, template)
+            if error:
+                messages.append(error)
+            directory = render_context(context, template)["project_directory"]
+            if directory in directories:
+                messages.append(
+                    f"The project directory {directory} is also used by context {directories[directory] + 1}"
+                )
+            directories.setdefault(directory, index)
+        if messages:
+            errors[index] = messages
+    if errors:
+        raise InvalidContextsError(errors)
+
+
+def _generate(context: dict[str, Any], output_dir: Path, template: Path) -> ProjectResult:
+    """Generates a project in a worker process, with the output of the hooks captured."""
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryFile() as log:
+        config_file = Path(directory) / "config.yaml"
+        config_file.write_text(f"replay_dir: {Path(directory) / 'replay'}\n", encoding="utf-8")
+        sys.stdout.flush()
+        saved = os.dup(1), os.dup(2)
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            project_path = cookiecutter(
+                str(template),
+                no_input=True,
+                extra_context=context,
+                output_dir=str(output_dir),
+                config_file=str(config_file),
+            )
+        except Exception as exc:  # noqa: BLE001
+            log.seek(0)
+            output = log.read().decode(errors="replace").strip()
+            error = f"{type(exc).__name__}: {exc}" + (f"\n{output}" if output else "")
+            return ProjectResult(context, error=error, seconds=time.perf_counter() - started)
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+    return ProjectResult(context, Path(project_path), seconds=time.perf_counter() - started)
+
+
+def generate(
+    contexts: list[dict[str, Any]], output_dir: Path, template: Path = TEMPLATE_DIR, workers: int | None = None
+) -> list[ProjectResult]:
+    """Generates the projects in parallel and returns the results in the order of the contexts."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results: dict[int, ProjectResult] = {}
+    pending = list(enumerate(contexts))
+
+    # The first project with qgis_plugin_tools is generated alone, so that
+    # the other projects find the mirror of the hook ready and do not all
+    # clone it at the same time
+    first = next(
+        ((index, context) for index, context in pending if render_context(context, template)["use_qgis_plugin_tools"]),
+        None,
+    )
+    if first is not None:
+        results[first[0]] = _generate(first[1], output_dir, template)
+        pending.remove(first)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {index: executor.submit(_generate, context, output_dir, template) for index, context in pending}
+            results.update((index, future.result()) for index, future in futures.items())
+    return [results[index] for index in range(len(contexts))]
+
+
+def lint(projects: list[Path]) -> dict[Path, dict[str, list[str]]]:
+    """
+    Lints the projects with one ruff check and one ruff format --check run.
+
+    Each project is checked with its own configuration, which ruff finds
+    from the pyproject.toml closest to each file. Returns the violations and
+    the unformatted files of each project.
+    """
+    projects = [project.resolve() for project in projects]
+    results: dict[Path, dict[str, list[str]]] = {project: {"check": [], "format": []} for project in projects}
+    if not projects:
+        return results
+
+    def add(kind: str, file: Path, message: str) -> None:
+        for project in projects:
+            if project in file.parents:
+                results[project][kind].append(f"{file.relative_to(project)}: {message}")
+
+    paths = [str(project) for project in projects]
+    check = _ruff(["check", "--output-format", "json", *paths])
+    for violation in json.loads(check.stdout or "[]"):
+        location = violation["location"]
+        message = f"{location['row']}:{location['column']}: {violation['code']} {violation['message']}"
+        add("check", Path(violation["filename"]), message)
+
+    formatting = _ruff(["format", "--check", *paths])
+    for line in formatting.stdout.splitlines():
+        if line.startswith("Would reformat: "):
+            add("format", Path(line[len("Would reformat: ") :]).resolve(), "would be reformatted")
+    return results
+
+
+def _ruff(args: list[str]) -> subprocess.CompletedProcess[str]:
+    result = subprocess.run(
+        [sys.executable, "-m", "ruff", *args],
+        capture_output=True,
+        timeout=LINT_TIMEOUT,
+        text=True,
+        check=False,
+    )
+    # Ruff exits with 1 if it finds problems and with 2 if it fails
+    if result.returncode > 1:
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+    return result
+
+
+def print_summary(results: list[ProjectResult], console: Console) -> None:
+    table = Table("Project", "Result", "Seconds", "Lint")
+    for result in results:
+        name = str(result.context.get("plugin_name", ""))
+        if result.error is not None:
+            table.add_row(name, "[red]failed[/red]", f"{result.seconds:.1f}", "")
+            continue
+        problems = sum(len(messages) for messages in result.lint.values())
+        lint_result = "" if not result.lint else "[green]ok[/green]" if not problems else f"[yellow]{problems}[/yellow]"
+        table.add_row(str(result.project_path), "[green]generated[/green]", f"{result.seconds:.1f}", lint_result)
+    console.print(table)
+
+    for result in results:
+        if result.error is not None:
+            console.print(f"\n[red]{result.context.get('plugin_name')}[/red] failed:", result.error, markup=False)
+        for messages in result.lint.values():
+            for message in messages:
+                console.print(f"{result.project_path}/{message}", markup=False, highlight=False)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(), formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("manifest", type=Path, help="a YAML or CSV file with the contexts of the projects")
+    parser.add_argument("--output-dir", type=Path, default=Path(), help="where to generate the projects")
+    parser.add_argument("--template", type=Path, default=TEMPLATE_DIR, help="the template, by default this one")
+    parser.add_argument("--workers", type=int, default=None, help="the number of worker processes")
+    parser.add_argument("--no-lint", action="store_true", help="do not lint the generated projects")
+    args = parser.parse_args(argv)
+
+    console = Console()
+    try:
+        contexts = read_manifest(args.manifest, args.template)
+        validate(contexts, args.template)
+    except BatchError as exc:
+        console.print(str(exc), markup=False)
+        return 2
+
+    # The worker processes inherit the environment
+    os.environ.setdefault(RENDER_CACHE_VARIABLE, "1")
+    results = generate(contexts, args.output_dir, args.template, args.workers)
+    if not args.no_lint:
+        lint_results = lint([result.project_path for result in results if result.project_path is not None])
+        for result in results:
+            if result.project_path is not None:
+                result.lint = lint_results[result.project_path.resolve()]
+
+    print_summary(results, console)
+    return 1 if any(result.error is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
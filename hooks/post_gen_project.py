@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 import platform
 import shutil
 import stat
 import subprocess
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 from textwrap import dedent
+from typing import Callable
 
 from rich.console import Console
 from rich.syntax import Syntax
@@ -20,6 +27,40 @@ QGIS_PLUGIN_TOOLS_SPECIFIC_FILES = (
     "test/test_plugin.py",
 )
 
+QGIS_PLUGIN_TOOLS_URL = "https://github.com/GispoCoding/qgis_plugin_tools"
+QGIS_PLUGIN_TOOLS_PATH = "{{cookiecutter.plugin_package}}/qgis_plugin_tools"
+
+# The qgis_plugin_tools submodule is cloned from a local mirror, which is
+# created on the first bake. The mirror directory and the commit of the
+# submodule can be set with these environment variables or the private
+# cookiecutter options _qgis_plugin_tools_cache_dir and _qgis_plugin_tools_ref.
+# Without a pinned commit the mirror is updated once a day. The mirror is
+# cloned from the repository set with QGIS_PLUGIN_TOOLS_MIRROR_URL, by
+# default from the upstream repository.
+QGIS_PLUGIN_TOOLS_CACHE_DIR_VARIABLE = "QGIS_PLUGIN_TOOLS_CACHE_DIR"
+QGIS_PLUGIN_TOOLS_MIRROR_URL_VARIABLE = "QGIS_PLUGIN_TOOLS_MIRROR_URL"
+QGIS_PLUGIN_TOOLS_REF_VARIABLE = "QGIS_PLUGIN_TOOLS_REF"
+QGIS_PLUGIN_TOOLS_CACHE_DIR = "{{ cookiecutter._qgis_plugin_tools_cache_dir }}"
+QGIS_PLUGIN_TOOLS_REF = "{{ cookiecutter._qgis_plugin_tools_ref }}"
+QGIS_PLUGIN_TOOLS_MIRROR_MAX_AGE = 24 * 60 * 60
+
+# If set, the plan of renamed and removed files is printed and not applied
+DRY_RUN_VARIABLE = "POST_GEN_DRY_RUN"
+
+# If set, the files are only rendered and no git repository is created.
+# The update script uses this to render the template for an existing project.
+RENDER_ONLY_VARIABLE = "POST_GEN_RENDER_ONLY"
+
+# The context, the template commit and the hashes of the generated files are
+# stored to this file, so that the project can later be updated from the
+# template with update_project.py
+PROJECT_MANIFEST = ".cookiecutter-qgis-plugin.json"
+
+COOKIECUTTER_CONTEXT = r"""{{ cookiecutter | jsonify }}"""
+
+# If set, the seconds each step of the hook took are written to this JSON file
+TIMINGS_FILE_VARIABLE = "POST_GEN_TIMINGS_FILE"
+
 
 def is_true(value: str) -> bool:
     return value == "True"
@@ -35,7 +76,7 @@ def warn(message: str) -> None:
     print(f"{Colors.WARNING}Warning: {message}{Colors.ENDC}")
 
 
-def _run(args: list[str]) -> None:
+def _run(args: list[str], *, warn_on_failure: bool = True) -> bool:
     try:
         logger.info('Running command "%s"', " ".join(args))
         subprocess.run(
@@ -44,80 +85,272 @@ def _run(args: list[str]) -> None:
             check=True,
         )
     except (subprocess.CalledProcessError, FileNotFoundError):
-        warn(f'Running command "{" ".join(args)}" failed.')
-
-
-def _remove_dir(dirpath):
-    if os.path.exists(dirpath):
-        shutil.rmtree(dirpath)
+        if warn_on_failure:
+            warn(f'Running command "{" ".join(args)}" failed.')
+        return False
+    return True
+
+
+class StepDependencyError(Exception):
+    def __init__(self, steps: list[str]) -> None:
+        super().__init__(f"The dependencies of the steps {', '.join(steps)} can not be satisfied.")
+
+
+@dataclass
+class Step:
+    """A step of the hook, which is run after the steps named in after are done."""
+
+    name: str
+    function: Callable[[], None]
+    after: tuple[str, ...] = ()
+
+
+def run_steps(steps: list[Step], max_workers: int = 4) -> dict[str, float]:
+    """
+    Runs the steps on a thread pool, each as soon as the steps it depends on are done.
+
+    Dependencies on steps that are not in the list are ignored, so optional
+    steps can be left out. Returns the seconds each step took. If a step
+    fails, its exception is raised after the running steps have finished.
+    """
+    names = {step.name for step in steps}
+    pending = list(steps)
+    done: set[str] = set()
+    running: dict[Future[None], str] = {}
+    timings: dict[str, float] = {}
+
+    def timed(step: Step) -> None:
+        started = time.perf_counter()
+        step.function()
+        timings[step.name] = time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [step for step in pending if all(name in done for name in step.after if name in names)]
+            for step in ready:
+                pending.remove(step)
+                running[executor.submit(timed, step)] = step.name
+            if not running:
+                raise StepDependencyError([step.name for step in pending])
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                done.add(running.pop(future))
+
+    return timings
+
+
+def _write_timings(timings: dict[str, float]) -> None:
+    for name, seconds in timings.items():
+        logger.info("Step %s took %.3f s", name, seconds)
+    timings_file = os.environ.get(TIMINGS_FILE_VARIABLE)
+    if timings_file:
+        Path(timings_file).write_text(json.dumps(timings, indent=2), encoding="utf-8")
+
+
+@dataclass
+class Manifest:
+    """The files and directories of the generated tree as relative POSIX paths."""
+
+    files: set[str] = field(default_factory=set)
+    directories: set[str] = field(default_factory=set)
+
+    @classmethod
+    def scan(cls, root: str = ".") -> Manifest:
+        """Walks the tree once. The .git directory is skipped, since it is created at the same time."""
+        manifest = cls()
+        stack = [("", root)]
+        while stack:
+            prefix, directory = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    path = prefix + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if path != ".git":
+                            manifest.directories.add(path)
+                            stack.append((path + "/", entry.path))
+                    else:
+                        manifest.files.add(path)
+        return manifest
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files or path in self.directories
+
+
+@dataclass
+class Plan:
+    """The files to rename and the files and directories to remove from the generated tree."""
+
+    renames: list[tuple[str, str]] = field(default_factory=list)
+    removals: list[str] = field(default_factory=list)
+    directories: set[str] = field(default_factory=set)
+    # The files in the tree after the plan is applied
+    files: list[str] = field(default_factory=list)
+
+    def report(self) -> str:
+        lines = [f"remove {path}{'/' if path in self.directories else ''}" for path in self.removals]
+        lines.extend(f"rename {source} -> {target}" for source, target in self.renames)
+        return "\n".join(lines)
+
+    def apply(self) -> None:
+        for path in self.removals:
+            if path in self.directories:
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        for source, target in self.renames:
+            os.rename(source, target)
+
+
+def _removed_paths() -> list[str]:
+    """Returns the paths that are not needed with the chosen options."""
+    paths = list(ALL_TEMP_FOLDERS)
+    if not is_true("{{ cookiecutter.use_qgis_plugin_tools }}"):
+        paths.extend(QGIS_PLUGIN_TOOLS_SPECIFIC_FILES)
+    if not is_true("{{ cookiecutter.add_vscode_config }}"):
+        paths.extend((".vscode", "{{cookiecutter.project_directory}}.code-workspace"))
+    if "{{ cookiecutter.ci_provider }}".lower() != "github":
+        paths.append(".github")
+    if not is_true("{{ cookiecutter.include_processing }}"):
+        paths.extend(("{{cookiecutter.plugin_package}}/{{cookiecutter.plugin_package}}_processing", "tests/processing"))
+    if "{{ cookiecutter.linting }}".lower() != "hatch":
+        paths.append("ruff_defaults.toml")
+    return paths
+
+
+def plan_changes(manifest: Manifest) -> Plan:
+    """
+    Plans the changes to the generated tree from the cookiecutter options.
+
+    The paths that do not exist are left out of the plan, and the Jinja
+    extension is removed only from the files that are kept.
+    """
+    plan = Plan(directories=manifest.directories)
+    plan.removals = [path for path in _removed_paths() if path in manifest]
+    removed_prefixes = tuple(path + "/" for path in plan.removals if path in manifest.directories)
+    kept = [path for path in manifest.files if path not in plan.removals and not path.startswith(removed_prefixes)]
+    plan.renames = sorted((path, path[: -len(".j2")]) for path in kept if path.endswith(".j2"))
+    renamed = dict(plan.renames)
+    plan.files = sorted(renamed.get(path, path) for path in kept)
+    return plan
+
+
+def _template_commit(repo_dir: str) -> str | None:
+    result = subprocess.run(
+        ["git", "-C", repo_dir, "rev-parse", "HEAD"],  # noqa: S607
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
 
 
-def _remove_file(filepath):
-    if os.path.exists(filepath):
-        os.remove(filepath)
+def write_project_manifest(files: list[str]) -> None:
+    context = json.loads(COOKIECUTTER_CONTEXT)
+    manifest = {
+        "template": context["_template"],
+        "commit": _template_commit(context["_repo_dir"]),
+        "context": {name: value for name, value in context.items() if not name.startswith("_")},
+        "files": {path: hashlib.sha256(Path(path).read_bytes()).hexdigest() for path in files},
+    }
+    Path(PROJECT_MANIFEST).write_text(json.dumps(manifest, indent=4) + "\n", encoding="utf-8")
 
 
 def git_init():
     _run(["git", "init"])
 
 
+def _default_cache_dir() -> Path:
+    if platform.system() == "Windows":
+        return Path(os.environ.get("LOCALAPPDATA", Path.home())) / "cookiecutter-qgis-plugin"
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "cookiecutter-qgis-plugin"
+
+
+def _plugin_tools_ref() -> str:
+    return os.environ.get(QGIS_PLUGIN_TOOLS_REF_VARIABLE) or QGIS_PLUGIN_TOOLS_REF
+
+
+def _has_commit(repository: Path, ref: str) -> bool:
+    return _run(["git", "-C", str(repository), "cat-file", "-e", ref + "^{commit}"], warn_on_failure=False)
+
+
+def _plugin_tools_mirror(ref: str) -> Path | None:
+    """
+    Returns a local bare mirror of qgis_plugin_tools which contains the ref.
+
+    The mirror is created if it does not exist, and updated if the ref is
+    not in it or, for an unpinned ref, if it has not been updated for a
+    day. Returns None if the mirror cannot be created, for example offline
+    on the first bake.
+    """
+    cache_dir = Path(
+        os.environ.get(QGIS_PLUGIN_TOOLS_CACHE_DIR_VARIABLE) or QGIS_PLUGIN_TOOLS_CACHE_DIR or _default_cache_dir()
+    )
+    mirror = cache_dir / "qgis_plugin_tools.git"
+
+    if not mirror.exists():
+        # Clone to a temporary directory first, so that concurrent bakes
+        # never see a partial mirror
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        temporary = Path(tempfile.mkdtemp(dir=cache_dir)) / "qgis_plugin_tools.git"
+        url = os.environ.get(QGIS_PLUGIN_TOOLS_MIRROR_URL_VARIABLE) or QGIS_PLUGIN_TOOLS_URL
+        try:
+            if _run(["git", "clone", "--mirror", url, str(temporary)], warn_on_failure=False):
+                temporary.rename(mirror)
+        except OSError:
+            # Another bake created the mirror after the check
+            if not mirror.exists():
+                raise
+        finally:
+            shutil.rmtree(temporary.parent, ignore_errors=True)
+        if not mirror.exists():
+            return None
+    elif (ref and not _has_commit(mirror, ref)) or (
+        not ref and time.time() - mirror.stat().st_mtime > QGIS_PLUGIN_TOOLS_MIRROR_MAX_AGE
+    ):
+        # Updating fails offline, and then the mirror is used as it is
+        if _run(["git", "-C", str(mirror), "remote", "update", "--prune"], warn_on_failure=False):
+            os.utime(mirror)
+
+    if ref and not _has_commit(mirror, ref):
+        return None
+    return mirror
+
+
 def add_plugin_tools():
+    ref = _plugin_tools_ref()
+    mirror = _plugin_tools_mirror(ref)
+    if mirror is None:
+        warn(f"Could not use a local mirror of qgis_plugin_tools, cloning it from {QGIS_PLUGIN_TOOLS_URL}.")
+
     _run(
         [
             "git",
+            "-c",
+            "protocol.file.allow=always",
             "submodule",
             "add",
-            "https://github.com/GispoCoding/qgis_plugin_tools",
-            "{{cookiecutter.plugin_package}}/qgis_plugin_tools",
+            str(mirror or QGIS_PLUGIN_TOOLS_URL),
+            QGIS_PLUGIN_TOOLS_PATH,
         ]
     )
+    if mirror is not None:
+        # Point the submodule to the upstream repository instead of the mirror
+        submodule_url = f"submodule.{QGIS_PLUGIN_TOOLS_PATH}.url"
+        _run(["git", "config", "--file", ".gitmodules", submodule_url, QGIS_PLUGIN_TOOLS_URL])
+        _run(["git", "submodule", "sync", "--quiet"])
+    if ref:
+        _run(["git", "-C", QGIS_PLUGIN_TOOLS_PATH, "checkout", "--quiet", ref])
+
     build_script = Path("{{cookiecutter.plugin_package}}/build.py")
     build_script.chmod(build_script.stat().st_mode | stat.S_IXUSR)
 
 
-def remove_plugin_tools():
-    for file in QGIS_PLUGIN_TOOLS_SPECIFIC_FILES:
-        _remove_file(file)
-
-
 def add_remote():
     _run(["git", "remote", "add", "origin", "{{cookiecutter.git_repo_url}}"])
 
 
-def remove_temp_folders():
-    for folder in ALL_TEMP_FOLDERS:
-        _remove_dir(folder)
-
-
-def _remove_ruff_defaults():
-    _remove_file("ruff_defaults.toml")
-
-
-def remove_vscode_files():
-    _remove_dir(".vscode")
-    _remove_file("{{cookiecutter.project_directory}}.code-workspace")
-
-
-def remove_github_files():
-    _remove_dir(".github")
-
-
-def remove_gitlab_files():
-    _remove_file(".gitlab-ci.yml")
-
-
-def remove_jinja_extensions():
-    jinja_files = Path(".").rglob(
-        "*.j2",
-    )
-    for file in jinja_files:
-        os.rename(file, file.with_suffix(""))
-
-
-def remove_processing_files():
-    _remove_dir("{{cookiecutter.plugin_package}}/{{cookiecutter.plugin_package}}_processing")
-
-
 def git_commit(message: str, *descriptions: str) -> None:
     _run(["git", "add", "."])
     commit_command = ["git", "commit", "-m", message]
@@ -139,12 +372,8 @@ def print_next_steps():
         dedent(
             f"""\
             cd {{ cookiecutter.project_directory }}
-            python create_qgis_venv.py
+            python create_qgis_venv.py --requirements requirements-dev.txt --wheelhouse
             {venv_activation_command}
-            python -m pip install -U pip
-            pip install pip-tools
-            pip-compile requirements-dev.in
-            pip install -r requirements-dev.txt
             """
         ),
         "console",
@@ -156,33 +385,47 @@ def print_next_steps():
 
 
 def main():
-    remove_jinja_extensions()
-
-    git_init()
+    started = time.perf_counter()
+
+    plan = plan_changes(Manifest.scan())
+    if os.environ.get(DRY_RUN_VARIABLE):
+        Console().print(plan.report(), markup=False, highlight=False)
+        return
+
+    # The git steps change the git configuration and the index, so they
+    # run one after another. The planned files are renamed and removed at
+    # the same time, also while the qgis_plugin_tools submodule is cloned,
+    # since the submodule is added to a path the plan does not touch.
+    steps = [
+        Step("apply_plan", plan.apply),
+        Step("write_project_manifest", lambda: write_project_manifest(plan.files), after=("apply_plan",)),
+    ]
+    if os.environ.get(RENDER_ONLY_VARIABLE):
+        run_steps(steps)
+        return
+
+    steps.append(Step("git_init", git_init))
 
     if is_true("{{ cookiecutter.use_qgis_plugin_tools }}"):
-        add_plugin_tools()
-    else:
-        remove_plugin_tools()
-
-    if not is_true("{{ cookiecutter.add_vscode_config }}"):
-        remove_vscode_files()
+        steps.append(Step("add_plugin_tools", add_plugin_tools, after=("git_init",)))
 
     if "{{ cookiecutter.git_repo_url }}":
-        add_remote()
-
-    if "{{ cookiecutter.ci_provider }}".lower() != "github":
-        remove_github_files()
+        steps.append(Step("add_remote", add_remote, after=("git_init", "add_plugin_tools")))
 
-    if not is_true("{{ cookiecutter.include_processing }}"):
-        remove_processing_files()
-
-    if "{{ cookiecutter.linting }}".lower() != "hatch":
-        _remove_ruff_defaults()
-
-    remove_temp_folders()
+    steps.append(
+        Step(
+            "git_commit",
+            lambda: git_commit("Initial commit", "Project created with the Cookiecutter QGIS Plugin Template."),
+            after=tuple(step.name for step in steps),
+        )
+    )
 
-    git_commit("Initial commit", "Project created with the Cookiecutter QGIS Plugin Template.")
+    steps_started = time.perf_counter()
+    timings = run_steps(steps)
+    # Less than the sum of the step times when the steps overlap
+    timings["steps"] = time.perf_counter() - steps_started
+    timings["total"] = time.perf_counter() - started
+    _write_timings(timings)
 
     print_next_steps()
 
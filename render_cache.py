@@ -0,0 +1,401 @@
+"""
+A cache of the rendered files of the template.
+
+Cookiecutter renders every file of the template with Jinja on each bake.
+This Jinja extension, enabled in cookiecutter.json, looks each file up in a
+content-addressed cache before Jinja compiles it. The key is a hash of the
+source of the file and the files it includes, and of the values of the
+context variables they refer to. Files which use other templates in other
+ways, or which render differently each time, for example with uuid4(), are
+always rendered.
+
+The cache is opt-in: it is used only when COOKIECUTTER_RENDER_CACHE is set
+to 1, which generate_batch.py and the test matrix of tests/bake_matrix.py
+do, since they bake the same files many times. It is stored in the
+directory set by COOKIECUTTER_RENDER_CACHE_DIR,
+by default ~/.cache/cookiecutter-qgis-plugin/render
+(%LOCALAPPDATA%\\cookiecutter-qgis-plugin\\render on Windows). When the cache
+grows larger than COOKIECUTTER_RENDER_CACHE_SIZE bytes, 64 MiB by default,
+the least recently used entries are removed. A size of 0 disables the cache.
+
+Run this module to print the statistics of the cache:
+
+    python render_cache.py [--clear]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, ClassVar
+
+import cookiecutter
+import jinja2
+from jinja2 import meta, nodes
+from jinja2.ext import Extension
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+RENDER_CACHE_VARIABLE = "COOKIECUTTER_RENDER_CACHE"
+RENDER_CACHE_DIR_VARIABLE = "COOKIECUTTER_RENDER_CACHE_DIR"
+RENDER_CACHE_SIZE_VARIABLE = "COOKIECUTTER_RENDER_CACHE_SIZE"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Changing this invalidates the cache
+CACHE_VERSION = "2"
+
+STATS_FILE = "stats.jsonl"
+
+# The globals that render the same each time
+DETERMINISTIC_GLOBALS = frozenset(("range", "dict", "cycler", "joiner", "namespace"))
+NONDETERMINISTIC_FILTERS = frozenset(("random",))
+
+
+@dataclass
+class Stats:
+    hits: int = 0
+    misses: int = 0
+    uncacheable: int = 0
+    evictions: int = 0
+
+    def add(self, other: Stats) -> None:
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+@dataclass(frozen=True)
+class Analysis:
+    """The variables a template and the templates it includes refer to, or cacheable False if it can not be cached."""
+
+    cacheable: bool
+    # The attributes of the cookiecutter variable, or None if the whole context is used
+    attributes: tuple[str, ...] | None = ()
+    variables: tuple[str, ...] = ()
+    includes: tuple[str, ...] = ()
+
+
+def _default_cache_dir() -> Path:
+    if platform.system() == "Windows":
+        return Path(os.environ.get("LOCALAPPDATA", Path.home())) / "cookiecutter-qgis-plugin" / "render"
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "cookiecutter-qgis-plugin" / "render"
+
+
+def enabled() -> bool:
+    """Returns whether the cache is enabled for the bakes of this process."""
+    return os.environ.get(RENDER_CACHE_VARIABLE, "") not in ("", "0")
+
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RenderCache:
+    _instances: ClassVar[dict[Path, RenderCache]] = {}
+
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.stats = Stats()
+        self._size: int | None = None
+        # The statistics are saved when the process exits, also in worker processes
+        Finalize(self, self.save_stats, exitpriority=10)
+
+    @classmethod
+    def from_environment(cls) -> RenderCache | None:
+        """Returns the cache configured with the environment variables, or None if the cache is disabled."""
+        max_size = int(os.environ.get(RENDER_CACHE_SIZE_VARIABLE, DEFAULT_MAX_SIZE))
+        if max_size <= 0:
+            return None
+        directory = Path(os.environ.get(RENDER_CACHE_DIR_VARIABLE) or _default_cache_dir())
+        if directory not in cls._instances:
+            cls._instances[directory] = cls(directory, max_size)
+        return cls._instances[directory]
+
+    def _path(self, key: str) -> Path:
+        return self.directory / "entries" / key[:2] / key
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in (self.directory / "entries").glob("*/*"):
+            try:
+                status = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        return entries
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            content = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        # The modification time orders the entries for eviction
+        os.utime(path)
+        return content
+
+    def put(self, key: str, content: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically, since other processes may read the entry at the same time
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, delete=False, newline="") as file:
+            file.write(content)
+        Path(file.name).replace(path)
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(content.encode())
+        if self._size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache is smaller than its maximum size."""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+            self.stats.evictions += 1
+
+    def save_stats(self) -> None:
+        if self.stats == Stats():
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / STATS_FILE).open("a", encoding="utf-8") as file:
+            file.write(json.dumps(asdict(self.stats)) + "\n")
+        self.stats = Stats()
+
+    def report(self) -> str:
+        total = Stats()
+        stats_file = self.directory / STATS_FILE
+        if stats_file.exists():
+            for line in stats_file.read_text(encoding="utf-8").splitlines():
+                total.add(Stats(**json.loads(line)))
+        total.add(self.stats)
+        entries = self._entries()
+        lookups = total.hits + total.misses
+        hit_rate = f"{total.hits / lookups:.0%}" if lookups else "-"
+        return "\n".join(
+            (
+                f"Directory: {self.directory}",
+                f"Entries: {len(entries)}",
+                f"Size: {sum(size for _, size, _ in entries) / 1024:.0f} KiB of {self.max_size / 1024:.0f} KiB",
+                f"Hits: {total.hits}",
+                f"Misses: {total.misses}",
+                f"Hit rate: {hit_rate}",
+                f"Not cacheable: {total.uncacheable}",
+                f"Evictions: {total.evictions}",
+            )
+        )
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._size = None
+        self.stats = Stats()
+
+
+def analyse(environment: Environment, name: str, source: str, load_source: Callable[[str], str]) -> Analysis:
+    """Finds the variables the template and the templates it includes refer to."""
+    attributes: set[str] | None = set()
+    variables: set[str] = set()
+    includes: list[str] = []
+    sources = [(name, source)]
+    while sources:
+        ast = environment.parse(*reversed(sources.pop()))
+        if any(ast.find_all((nodes.Extends, nodes.Import, nodes.FromImport, nodes.ExtensionAttribute))):
+            return Analysis(cacheable=False)
+        if any(node.name in NONDETERMINISTIC_FILTERS for node in ast.find_all(nodes.Filter)):
+            return Analysis(cacheable=False)
+
+        for include in ast.find_all(nodes.Include):
+            if not isinstance(include.template, nodes.Const) or not isinstance(include.template.value, str):
+                return Analysis(cacheable=False)
+            if include.template.value not in includes:
+                includes.append(include.template.value)
+                sources.append((include.template.value, load_source(include.template.value)))
+
+        # find_undeclared_variables leaves the globals out, so they are looked up from the names
+        names = {node.name for node in ast.find_all(nodes.Name) if node.ctx == "load"}
+        if any(name in environment.globals and name not in DETERMINISTIC_GLOBALS for name in names):
+            return Analysis(cacheable=False)
+        variables.update(meta.find_undeclared_variables(ast))
+
+        # cookiecutter.name is the usual way to use the context. If the
+        # cookiecutter variable is used otherwise, the whole context is used.
+        uses = [node for node in ast.find_all(nodes.Name) if node.name == "cookiecutter" and node.ctx == "load"]
+        lookups = [
+            node.attr
+            for node in ast.find_all(nodes.Getattr)
+            if isinstance(node.node, nodes.Name) and node.node.name == "cookiecutter"
+        ]
+        if attributes is not None:
+            attributes = attributes.union(lookups) if len(uses) == len(lookups) else None
+
+    return Analysis(
+        cacheable=True,
+        attributes=None if attributes is None else tuple(sorted(attributes)),
+        variables=tuple(sorted(variables)),
+        includes=tuple(includes),
+    )
+
+
+class CachedTemplate:
+    """A template whose render looks the rendered text up from the cache first."""
+
+    def __init__(self, key: str, analysis: Analysis, cache: RenderCache, load: Callable[[], Template]) -> None:
+        self._key = key
+        self._analysis = analysis
+        self._cache = cache
+        self._load = load
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def _context_key(self, context: dict[str, Any]) -> str | None:
+        values = {}
+        for name in self._analysis.variables:
+            if name not in context:
+                return None
+            value = context[name]
+            if name == "cookiecutter" and self._analysis.attributes is not None:
+                if not all(attribute in value for attribute in self._analysis.attributes):
+                    return None
+                value = {attribute: value[attribute] for attribute in self._analysis.attributes}
+            values[name] = value
+        return _hash(self._key, json.dumps(values, sort_keys=True, default=repr))
+
+    def render(self, *args: Any, **kwargs: Any) -> str:
+        context = dict(*args, **kwargs)
+        key = self._context_key(context)
+        if key is None:
+            # Let Jinja report the undefined variable
+            return self._load().render(context)
+
+        content = self._cache.get(key)
+        if content is None:
+            self._cache.stats.misses += 1
+            content = self._load().render(context)
+            self._cache.put(key, content)
+        else:
+            self._cache.stats.hits += 1
+        return content
+
+
+class RenderCacheExtension(Extension):
+    """Makes the get_template of the environment return templates which are rendered through the cache."""
+
+    def __init__(self, environment: Environment) -> None:
+        super().__init__(environment)
+        cache = RenderCache.from_environment() if enabled() else None
+        if cache is None:
+            return
+
+        get_template = environment.get_template
+
+        def cached_get_template(name: str | Template, parent: str | None = None, template_globals: Any = None) -> Any:
+            if (
+                not isinstance(name, str)
+                or parent is not None
+                or template_globals is not None
+                or environment.loader is None
+            ):
+                return get_template(name, parent, template_globals)
+
+            def load_source(template_name: str) -> str:
+                return environment.loader.get_source(environment, template_name)[0]
+
+            source = load_source(name)
+            source_key = _hash(
+                CACHE_VERSION, jinja2.__version__, cookiecutter.__version__, _environment_options(environment), source
+            )
+            analysis = _cached_analysis(environment, cache, source_key, name, source, load_source)
+            if not analysis.cacheable:
+                cache.stats.uncacheable += 1
+                return get_template(name)
+            # The included templates are part of the key
+            key = _hash(source_key, *(load_source(include) for include in analysis.includes))
+            return CachedTemplate(key, analysis, cache, lambda: get_template(name))
+
+        environment.get_template = cached_get_template  # type: ignore[method-assign]
+
+
+def _environment_options(environment: Environment) -> str:
+    """Returns the options of the environment which affect how the templates are rendered."""
+    options = [
+        getattr(environment, name)
+        for name in (
+            "block_start_string",
+            "variable_start_string",
+            "comment_start_string",
+            "trim_blocks",
+            "lstrip_blocks",
+            "newline_sequence",
+            "keep_trailing_newline",
+            "autoescape",
+        )
+    ]
+    return repr([*options, *sorted(environment.extensions)])
+
+
+def _cached_analysis(
+    environment: Environment,
+    cache: RenderCache,
+    source_key: str,
+    name: str,
+    source: str,
+    load_source: Callable[[str], str],
+) -> Analysis:
+    """Returns the analysis of the source, which is cached so that a cache hit does not parse the template."""
+    key = _hash("analysis", source_key)
+    cached = cache.get(key)
+    if cached is not None:
+        analysis = json.loads(cached)
+        if analysis["attributes"] is not None:
+            analysis["attributes"] = tuple(analysis["attributes"])
+        return Analysis(
+            cacheable=analysis["cacheable"],
+            attributes=analysis["attributes"],
+            variables=tuple(analysis["variables"]),
+            includes=tuple(analysis["includes"]),
+        )
+    analysis = analyse(environment, name, source, load_source)
+    cache.put(key, json.dumps(asdict(analysis)))
+    return analysis
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Prints the statistics of the render cache.")
+    parser.add_argument("--clear", action="store_true", help="remove the cache")
+    args = parser.parse_args(argv)
+
+    cache = RenderCache.from_environment()
+    if cache is None:
+        print("The render cache is disabled.")
+        return 0
+    if args.clear:
+        cache.clear()
+        print(f"Removed {cache.directory}")
+        return 0
+    print(cache.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Bakes the projects of the test matrix once and shares them between the tests.
+
+The unique contexts are baked in parallel worker processes to a cache
+directory, where each project is stored under a hash of the template and
+the context. The pytest-xdist workers share the cache directory, and a lock
+file makes sure that each project is baked by one of them only. All the
+baked projects are linted with a single ruff invocation.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+from cookiecutter.exceptions import UndefinedVariableInTemplate
+from cookiecutter.main import cookiecutter
+
+from generate_batch import TEMPLATE_DIR, lint
+from render_cache import RENDER_CACHE_VARIABLE
+
+TEMPLATE_PATHS = ("cookiecutter.json", "render_cache.py", "hooks", "{{cookiecutter.project_directory}}")
+
+# If set, the baked projects are cached in this directory between test runs
+BAKE_CACHE_DIR_VARIABLE = "COOKIECUTTER_BAKE_CACHE_DIR"
+
+# Seconds to wait for another worker to bake a project, after which its
+# lock is considered stale
+LOCK_TIMEOUT = 600
+
+
+@dataclass
+class BakedProject:
+    context: dict[str, Any]
+    project_path: Path
+    error: str | None = None
+
+
+@lru_cache(maxsize=None)
+def template_digest() -> str:
+    """Returns a hash of the contents of the template."""
+    digest = hashlib.sha256()
+    for name in TEMPLATE_PATHS:
+        path = TEMPLATE_DIR / name
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in files:
+            if file.is_file() and "__pycache__" not in file.parts:
+                digest.update(file.relative_to(TEMPLATE_DIR).as_posix().encode())
+                digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def context_key(context: dict[str, Any]) -> str:
+    """Returns the cache key of a project baked from the current template with the context."""
+    content = json.dumps(context, sort_keys=True) + template_digest()
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def _bake(context: dict[str, Any], directory: Path) -> dict[str, str | None]:
+    """Bakes a project to the directory and returns the path of the project and the error, if any."""
+    # Run in a worker process, so the render cache is enabled for the bakes of the matrix only
+    os.environ[RENDER_CACHE_VARIABLE] = "1"
+    config_file = directory / "config.yaml"
+    config_file.write_text(
+        f"cookiecutters_dir: {directory / 'cookiecutters'}\nreplay_dir: {directory / 'replay'}\n", encoding="utf-8"
+    )
+    try:
+        project_path = cookiecutter(
+            str(TEMPLATE_DIR),
+            no_input=True,
+            extra_context=context,
+            output_dir=str(directory / "output"),
+            config_file=str(config_file),
+        )
+    except UndefinedVariableInTemplate as exc:
+        return {"project_path": None, "error": f"Undefined variable in template: {exc.message} ({exc.error.message})"}
+    except Exception as exc:  # noqa: BLE001
+        return {"project_path": None, "error": f"{type(exc).__name__}: {exc}"}
+    return {"project_path": project_path, "error": None}
+
+
+def _write_json(path: Path, content: Any) -> None:
+    """Writes the file atomically, since other workers wait for it to exist."""
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(json.dumps(content), encoding="utf-8")
+    temporary.replace(path)
+
+
+def _read_json(path: Path) -> Any:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _acquire(lock: Path) -> bool:
+    """Creates the lock file if no one else holds it. A lock older than LOCK_TIMEOUT is taken over."""
+    for _ in range(2):
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if time.time() - lock.stat().st_mtime < LOCK_TIMEOUT:
+                    return False
+                lock.unlink()
+            except FileNotFoundError:
+                pass
+        else:
+            return True
+    return False
+
+
+def _wait_for(path: Path) -> Any:
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not path.exists():
+        if time.monotonic() > deadline:
+            raise TimeoutError(path)
+        time.sleep(0.1)
+    return _read_json(path)
+
+
+def _shared(path: Path, compute: Callable[[], Any]) -> Any:
+    """Returns the content of the file, which is computed by the first worker that needs it."""
+    if path.exists():
+        return _read_json(path)
+    lock = path.with_name(f"{path.name}.lock")
+    if not _acquire(lock):
+        return _wait_for(path)
+    try:
+        content = compute()
+        _write_json(path, content)
+    finally:
+        lock.unlink()
+    return content
+
+
+class BakeMatrix:
+    def __init__(self, cache_dir: Path, contexts: list[dict[str, Any]]) -> None:
+        self.cache_dir = cache_dir
+        self.contexts = {context_key(context): context for context in contexts}
+        self._projects: dict[str, BakedProject] = {}
+        self._lint_results: dict[str, dict[str, list[str]]] | None = None
+
+    def __getitem__(self, context: dict[str, Any]) -> BakedProject:
+        return self.bake()[context_key(context)]
+
+    def _result_file(self, key: str) -> Path:
+        return self.cache_dir / key / "result.json"
+
+    def bake(self) -> dict[str, BakedProject]:
+        """Bakes the contexts which are not baked yet and returns the projects by their keys."""
+        if self._projects:
+            return self._projects
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        missing = [key for key in self.contexts if not self._result_file(key).exists()]
+        own = [key for key in missing if _acquire(self.cache_dir / f"{key}.lock")]
+        if own:
+            for key in own:
+                shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+                (self.cache_dir / key).mkdir()
+            try:
+                with ProcessPoolExecutor(max_workers=min(len(own), os.cpu_count() or 1)) as executor:
+                    futures = {key: executor.submit(_bake, self.contexts[key], self.cache_dir / key) for key in own}
+                    for key, future in futures.items():
+                        _write_json(self._result_file(key), future.result())
+            finally:
+                for key in own:
+                    (self.cache_dir / f"{key}.lock").unlink()
+
+        for key, context in self.contexts.items():
+            result = _wait_for(self._result_file(key))
+            project_path = Path(result["project_path"] or self.cache_dir / key / "output")
+            self._projects[key] = BakedProject(context, project_path, result["error"])
+        return self._projects
+
+    def lint(self, project: BakedProject) -> dict[str, list[str]]:
+        """Returns the ruff check violations and the unformatted files of the project."""
+        if project.error is not None:
+            return {"check": [project.error], "format": [project.error]}
+        if self._lint_results is None:
+            keys = sorted(key for key, baked in self.bake().items() if baked.error is None)
+            lint_key = hashlib.sha256(" ".join(keys).encode()).hexdigest()[:16]
+            self._lint_results = _shared(self.cache_dir / f"lint-{lint_key}.json", lambda: self._lint(keys))
+        return self._lint_results[context_key(project.context)]
+
+    def _lint(self, keys: list[str]) -> dict[str, dict[str, list[str]]]:
+        results = lint([self._projects[key].project_path for key in keys])
+        return {key: results[self._projects[key].project_path.resolve()] for key in keys}
@@ -0,0 +1,84 @@
+"""
+Generates the option combinations the template is tested with.
+
+The choice and boolean options are read from cookiecutter.json. A
+combination is valid if the checks of hooks/pre_gen_project.py accept it,
+which is found out by rendering the hook and running its checks. Of the
+valid combinations, a small set is picked greedily so that every
+combination of values of any ``strength`` options that is possible at all
+is baked at least once.
+"""
+
+from __future__ import annotations
+
+import itertools
+from typing import Any, Dict, Iterator, Tuple
+
+from generate_batch import cookiecutter_json, pre_gen_error
+
+Combination = Dict[str, Any]
+Interaction = Tuple[Tuple[str, Any], ...]
+
+
+def option_values() -> dict[str, list[Any]]:
+    """Returns the possible values of the choice and boolean options, excluding the private ones."""
+    options: dict[str, list[Any]] = {}
+    for name, default in cookiecutter_json().items():
+        if name.startswith("_"):
+            continue
+        if isinstance(default, list):
+            options[name] = default
+        elif isinstance(default, bool):
+            options[name] = [default, not default]
+    return options
+
+
+def is_valid(context: Combination) -> bool:
+    """Returns True if the pre-generation hook accepts the context."""
+    return pre_gen_error(context) is None
+
+
+def _interactions(combination: Combination, strength: int) -> Iterator[Interaction]:
+    return itertools.combinations(sorted(combination.items()), strength)
+
+
+def covering_combinations(
+    base: Combination | None = None, strength: int = 2, options: dict[str, list[Any]] | None = None
+) -> list[Combination]:
+    """
+    Returns valid combinations of the options which cover every possible interaction of ``strength`` options.
+
+    The first combination has the default values of the options, or their
+    values in base. The other values of base are used in every combination.
+    """
+    options = option_values() if options is None else options
+    base = base or {}
+    names = sorted(options)
+    candidates = [
+        dict(zip(names, values))
+        for values in itertools.product(*(options[name] for name in names))
+        if is_valid({**base, **dict(zip(names, values))})
+    ]
+
+    uncovered = {interaction for candidate in candidates for interaction in _interactions(candidate, strength)}
+    default = {name: base.get(name, values[0]) for name, values in options.items()}
+    selected = [default] if default in candidates else []
+    uncovered.difference_update(_interactions(default, strength))
+    while uncovered:
+        best = max(candidates, key=lambda candidate: len(uncovered.intersection(_interactions(candidate, strength))))
+        selected.append(best)
+        uncovered.difference_update(_interactions(best, strength))
+    return selected
+
+
+def invalid_values(base: Combination | None = None, options: dict[str, list[Any]] | None = None) -> list[Combination]:
+    """Returns the option values which make any combination invalid, each as a context override."""
+    options = option_values() if options is None else options
+    base = base or {}
+    valid = covering_combinations(base, strength=1, options=options)
+    return [
+        {name: value}
+        for name, values in options.items()
+        for value in values
+        if not any(combination[name] == value for combination in valid)
+    ]
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator
+
+import pytest
+
+from tests.testing_utils import commit_file, run_git
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+QGIS_PLUGIN_TOOLS_CACHE_DIR_VARIABLE = "QGIS_PLUGIN_TOOLS_CACHE_DIR"
+RENDER_CACHE_DIR_VARIABLE = "COOKIECUTTER_RENDER_CACHE_DIR"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def qgis_plugin_tools_repository(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Path]:
+    """
+    Serves qgis_plugin_tools to the bakes from a local stand-in repository.
+
+    The post-generation hook clones the submodule from the mirror in the
+    cache directory, so the tests need no network access. Returns the
+    stand-in repository the mirror is cloned from.
+    """
+    repository = tmp_path_factory.mktemp("qgis_plugin_tools")
+    run_git(["init", "--quiet"], repository)
+    commit_file(repository, "README.md", "Stand-in for qgis_plugin_tools\n")
+
+    cache_dir = tmp_path_factory.mktemp("cache")
+    run_git(["clone", "--quiet", "--mirror", str(repository), str(cache_dir / "qgis_plugin_tools.git")], repository)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(QGIS_PLUGIN_TOOLS_CACHE_DIR_VARIABLE, str(cache_dir))
+        yield repository
+
+
+@pytest.fixture(scope="session", autouse=True)
+def render_cache_dir(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Path]:
+    """Keeps the render cache of the bakes of the test matrix out of the cache directory of the user."""
+    cache_dir = tmp_path_factory.mktemp("render_cache")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(RENDER_CACHE_DIR_VARIABLE, str(cache_dir))
+        yield cache_dir
@@ -0,0 +1,154 @@
+"""
+Benchmarks of how long it takes to generate a project.
+
+Each context is baked a few times to measure the time it takes to render
+the template, the time of each step of the post-generation hook and the
+time to lint the generated project. The median times are compared to the
+baseline of the machine, and a benchmark fails if a time exceeds its
+baseline by more than the threshold. Times missing from the baseline are
+added to it. The times depend on the machine, so the baseline is kept in
+the user cache directory, in
+~/.cache/cookiecutter-qgis-plugin/benchmark_baseline.json
+(%LOCALAPPDATA%\\cookiecutter-qgis-plugin\\benchmark_baseline.json on
+Windows). The qgis_plugin_tools submodule is cloned from the local
+stand-in repository of tests/conftest.py.
+
+The benchmarks are not run by default, and they must not be run in
+parallel with other tests. Run them with::
+
+    pytest -m benchmark -n 0
+
+Environment variables:
+    TEMPLATE_BENCHMARK_BASELINE: the path of the baseline file
+    TEMPLATE_BENCHMARK_THRESHOLD: the allowed relative regression, 0.25 by default
+    TEMPLATE_BENCHMARK_ROUNDS: the number of bakes per context, 3 by default
+    TEMPLATE_BENCHMARK_UPDATE: if set, the baseline is replaced with the new times
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from cookiecutter.main import cookiecutter
+
+from generate_batch import TEMPLATE_DIR
+from render_cache import RENDER_CACHE_VARIABLE
+from tests.test_cookiecutter_generation import OPT_IN_FEATURES_INCLUDED, OPT_IN_FEATURES_REMOVED, SESSION_CONTEXT
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+pytestmark = pytest.mark.benchmark
+
+
+def _default_baseline_file() -> Path:
+    if platform.system() == "Windows":
+        cache_dir = Path(os.environ.get("LOCALAPPDATA", Path.home()))
+    else:
+        cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return cache_dir / "cookiecutter-qgis-plugin" / "benchmark_baseline.json"
+
+
+BASELINE_FILE = Path(os.environ.get("TEMPLATE_BENCHMARK_BASELINE", _default_baseline_file()))
+THRESHOLD = float(os.environ.get("TEMPLATE_BENCHMARK_THRESHOLD", "0.25"))
+ROUNDS = int(os.environ.get("TEMPLATE_BENCHMARK_ROUNDS", "3"))
+UPDATE_BASELINE = bool(os.environ.get("TEMPLATE_BENCHMARK_UPDATE"))
+
+# Differences smaller than this are noise, however large they are relatively
+MIN_REGRESSION_SECONDS = 0.05
+
+BENCHMARK_CONTEXTS = {
+    "features_removed": OPT_IN_FEATURES_REMOVED,
+    "features_included": OPT_IN_FEATURES_INCLUDED,
+    "minimal_linting": {**OPT_IN_FEATURES_INCLUDED, "linting": "minimal"},
+}
+
+
+def _timed(function: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def _bake(context: dict[str, Any], output_dir: Path, config_file: Path, *, accept_hooks: bool) -> Path:
+    return Path(
+        cookiecutter(
+            str(TEMPLATE_DIR),
+            no_input=True,
+            extra_context=context,
+            output_dir=str(output_dir),
+            config_file=str(config_file),
+            accept_hooks=accept_hooks,
+        )
+    )
+
+
+def _ruff(args: list[str], project_path: Path) -> None:
+    subprocess.run([sys.executable, "-m", "ruff", *args, "--no-cache", "."], cwd=project_path, check=False)
+
+
+def _measure(context: dict[str, Any], directory: Path, monkeypatch: pytest.MonkeyPatch) -> dict[str, float]:
+    """Bakes the context once and returns the seconds each phase took."""
+    # The render cache would hide the rendering time
+    monkeypatch.delenv(RENDER_CACHE_VARIABLE, raising=False)
+    directory.mkdir()
+    config_file = directory / "config.yaml"
+    config_file.write_text(f"replay_dir: {directory / 'replay'}\n", encoding="utf-8")
+
+    times = {"render": _timed(lambda: _bake(context, directory / "render", config_file, accept_hooks=False))}
+
+    hook_timings = directory / "timings.json"
+    monkeypatch.setenv("POST_GEN_TIMINGS_FILE", str(hook_timings))
+    project_path = _bake(context, directory / "bake", config_file, accept_hooks=True)
+    for step, seconds in json.loads(hook_timings.read_text(encoding="utf-8")).items():
+        times[f"post_gen.{step}"] = seconds
+
+    times["ruff_check"] = _timed(lambda: _ruff(["check", "--quiet"], project_path))
+    times["ruff_format"] = _timed(lambda: _ruff(["format", "--check", "--quiet"], project_path))
+    return times
+
+
+def _compare(name: str, times: dict[str, float]) -> list[str]:
+    """Updates the baseline with the times and returns the regressions."""
+    baseline = json.loads(BASELINE_FILE.read_text(encoding="utf-8")) if BASELINE_FILE.exists() else {}
+    baseline_times = {} if UPDATE_BASELINE else baseline.get(name, {})
+
+    regressions = [
+        f"{phase}: {seconds:.3f} s, baseline {baseline_times[phase]:.3f} s"
+        for phase, seconds in times.items()
+        if phase in baseline_times
+        and seconds > baseline_times[phase] * (1 + THRESHOLD)
+        and seconds - baseline_times[phase] > MIN_REGRESSION_SECONDS
+    ]
+
+    baseline[name] = {**times, **baseline_times}
+    BASELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return regressions
+
+
+@pytest.mark.parametrize("name", BENCHMARK_CONTEXTS)
+def test_generation_time(name: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    if "PYTEST_XDIST_WORKER" in os.environ:
+        pytest.skip("The benchmarks must be run without parallel tests, with -n 0")
+
+    context = {**SESSION_CONTEXT, **BENCHMARK_CONTEXTS[name]}
+    rounds = [_measure(context, tmp_path / str(index), monkeypatch) for index in range(ROUNDS)]
+    times = {phase: statistics.median(times[phase] for times in rounds) for phase in rounds[0]}
+
+    for phase, seconds in times.items():
+        print(f"{name} {phase}: {seconds:.3f} s")  # noqa: T201
+
+    regressions = _compare(name, times)
+    assert not regressions, f"{name} is slower than the baseline by more than {THRESHOLD:.0%}:\n" + "\n".join(
+        regressions
+    )
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+from tests.test_cookiecutter_generation import SESSION_CONTEXT
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pytest_cookies.plugin import Cookies
+
+# Stand-ins for the parts of qgis_plugin_tools which build.py uses, since
+# qgis_plugin_tools can not be imported without QGIS
+STAND_INS = {
+    "__init__.py": "",
+    "infrastructure/__init__.py": "",
+    "infrastructure/plugin_maker.py": """\
+import os
+import shutil
+import subprocess
+import sys
+
+
+def echo(*args, **kwargs):
+    print(*args)
+
+
+class PluginMaker:
+    def __init__(self, py_files, ui_files, resources=(), extra_dirs=("resources",), extras=("metadata.txt",),
+                 compiled_resources=(), locales=(), profile="default", lrelease="lrelease", pyrcc="pyrcc5"):
+        self.py_files = py_files
+        self.ui_files = ui_files
+        self.resources = resources
+        self.extra_dirs = extra_dirs
+        self.extras = extras
+        self.compiled_resources = compiled_resources
+        self.locales = locales
+        self.lrelease = lrelease
+        self.pyrcc = pyrcc
+        self.plugin_dir = os.path.join(os.environ["QGIS_PROFILE_DIR"], profile, "python", "plugins", "plugin")
+        getattr(self, sys.argv[1])()
+
+    def clean(self):
+        for fil in self.compiled_resources:
+            if os.path.exists(fil):
+                os.remove(fil)
+
+    def _get_platform_args(self):
+        return []
+
+    @staticmethod
+    def run_command(args, d=None, force_show_output=False):
+        subprocess.run(args, cwd=d, check=True)
+""",
+    "tools/__init__.py": "",
+    "tools/resources.py": """\
+import os
+
+
+def resources_path(*args):
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "resources", *args))
+""",
+}
+
+# Record their calls to tools.log, wait for TOOL_DELAY_<NAME> seconds, write the output
+# file and record the time they were running to tools.times
+TOOLS = {
+    "pyrcc5": (
+        "import pathlib, sys; "
+        "pathlib.Path(sys.argv[2]).write_text(pathlib.Path(sys.argv[3]).with_name('icons').joinpath('icon.png').read_text())"
+    ),
+    "lrelease": "import pathlib, sys; ts = pathlib.Path(sys.argv[1]); ts.with_suffix('.qm').write_text(ts.read_text())",
+}
+
+QRC = """\
+<RCC>
+  <qresource prefix="/plugin">
+    <file>icons/icon.png</file>
+  </qresource>
+</RCC>
+"""
+
+
+@pytest.fixture
+def plugin_package(cookies: Cookies, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    result = cookies.bake(extra_context={**SESSION_CONTEXT, "use_qgis_plugin_tools": True})
+    assert result.exception is None
+    plugin_package = result.project_path / "plugin"
+    for name, content in STAND_INS.items():
+        path = plugin_package / "qgis_plugin_tools" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    (plugin_package / "resources" / "icons" / "icon.png").write_text("icon", encoding="utf-8")
+    (plugin_package / "resources" / "resources.qrc").write_text(QRC, encoding="utf-8")
+    (plugin_package / "resources" / "i18n" / "fi.ts").write_text("<TS/>", encoding="utf-8")
+
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    for name, script in TOOLS.items():
+        tool = tools / name
+        log = f"open({str(tmp_path / 'tools.log')!r}, 'a').write({name!r} + '\\n')"
+        delay = f"import os, time\nstart = time.time()\ntime.sleep(float(os.getenv('TOOL_DELAY_{name.upper()}', 0)))"
+        times = f"open({str(tmp_path / 'tools.times')!r}, 'a').write(f'{{start}} {{time.time()}}\\n')"
+        tool.write_text(f"#!{sys.executable}\n{log}\n{delay}\n{script}\n{times}\n", encoding="utf-8")
+        tool.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tools}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("QGIS_PROFILE_DIR", str(tmp_path / "profiles"))
+    return plugin_package
+
+
+@pytest.fixture
+def deployed_plugin(tmp_path: Path) -> Path:
+    return tmp_path / "profiles" / "default" / "python" / "plugins" / "plugin"
+
+
+def _run(plugin_package: Path, *args: str) -> list[str]:
+    output = subprocess.check_output(
+        [sys.executable, "build.py", *args], cwd=plugin_package, text=True, stderr=subprocess.STDOUT
+    )
+    return output.splitlines()
+
+
+def _build(plugin_package: Path, command: str) -> list[str]:
+    """Runs the build.py command and returns the files it copied or removed."""
+    return [line.split()[1] for line in _run(plugin_package, command) if line.startswith(("cp ", "rm "))]
+
+
+def _add_locale(plugin_package: Path, locale: str) -> None:
+    build_script = plugin_package / "build.py"
+    content = build_script.read_text(encoding="utf-8").replace('locales = ["fi"]', f'locales = ["fi", "{locale}"]')
+    build_script.write_text(content, encoding="utf-8")
+    (plugin_package / "resources" / "i18n" / f"{locale}.ts").write_text("<TS/>", encoding="utf-8")
+
+
+def _tool_calls(tmp_path: Path) -> list[str]:
+    log = tmp_path / "tools.log"
+    calls = log.read_text(encoding="utf-8").splitlines() if log.exists() else []
+    log.unlink(missing_ok=True)
+    return calls
+
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="The stand-in tools are scripts with a shebang")
+
+
+def test_unchanged_plugin_is_not_built_again(plugin_package: Path, deployed_plugin: Path, tmp_path: Path):
+    copied = _build(plugin_package, "deploy")
+    assert _tool_calls(tmp_path) == ["pyrcc5"]
+    assert "plugin.py" in copied
+    assert (deployed_plugin / "resources" / "resources.py").read_text(encoding="utf-8") == "icon"
+    assert (deployed_plugin / "resources" / "icons" / "icon.png").is_file()
+
+    assert _build(plugin_package, "deploy") == []
+    assert _tool_calls(tmp_path) == []
+
+
+def test_changed_files_are_built_and_deployed(plugin_package: Path, deployed_plugin: Path, tmp_path: Path):
+    _build(plugin_package, "deploy")
+    _tool_calls(tmp_path)
+    (plugin_package / "resources" / "icons" / "icon.png").write_text("new icon", encoding="utf-8")
+    (plugin_package / "plugin.py").write_text("# Changed\n", encoding="utf-8")
+
+    copied = _build(plugin_package, "deploy")
+
+    assert _tool_calls(tmp_path) == ["pyrcc5"]
+    assert sorted(copied) == ["plugin.py", "resources/icons/icon.png", "resources/resources.py"]
+    assert (deployed_plugin / "plugin.py").read_text(encoding="utf-8") == "# Changed\n"
+
+
+def test_removed_files_are_removed_from_deployed_plugin(plugin_package: Path, deployed_plugin: Path):
+    (plugin_package / "extra.py").write_text("", encoding="utf-8")
+    _build(plugin_package, "deploy")
+    assert (deployed_plugin / "extra.py").is_file()
+    (plugin_package / "extra.py").unlink()
+
+    _build(plugin_package, "deploy")
+
+    assert not (deployed_plugin / "extra.py").exists()
+
+
+def test_changed_translations_are_compiled(plugin_package: Path, tmp_path: Path):
+    _build(plugin_package, "transcompile")
+    _build(plugin_package, "transcompile")
+    assert _tool_calls(tmp_path) == ["lrelease"]
+
+    (plugin_package / "resources" / "i18n" / "fi.ts").write_text("<TS></TS>", encoding="utf-8")
+    _build(plugin_package, "transcompile")
+
+    assert _tool_calls(tmp_path) == ["lrelease"]
+    assert (plugin_package / "resources" / "i18n" / "fi.qm").is_file()
+
+
+def test_independent_jobs_are_run_at_the_same_time(
+    plugin_package: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    _add_locale(plugin_package, "sv")
+    monkeypatch.setenv("TOOL_DELAY_PYRCC5", "0.5")
+    monkeypatch.setenv("TOOL_DELAY_LRELEASE", "0.5")
+
+    output = _run(plugin_package, "build", "--jobs", "3")
+
+    assert sorted(_tool_calls(tmp_path)) == ["lrelease", "lrelease", "pyrcc5"]
+    times = [tuple(map(float, line.split())) for line in (tmp_path / "tools.times").read_text().splitlines()]
+    assert max(start for start, _ in times) < min(end for _, end in times)
+    assert "Built 3 of 3 files" in "\n".join(output)
+    assert sum("(critical path)" in line for line in output) == 1
+
+
+def test_output_is_shown_in_job_order(plugin_package: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("TOOL_DELAY_PYRCC5", "0.5")
+
+    output = _run(plugin_package, "build", "--jobs", "2")
+
+    commands = [line.split()[0] for line in output if line.startswith(("pyrcc5 ", "lrelease "))]
+    assert commands == ["pyrcc5", "lrelease"]
+    timings = [line.split()[2] for line in output if re.match(r" +[0-9.]+ s  ", line)]
+    assert timings == ["resources/resources.py", f"{plugin_package}/resources/i18n/fi.qm"]
+    assert output[-1].startswith("Critical path: resources/resources.py (")
+
+
+def test_resources_are_compiled_after_translations_they_contain(plugin_package: Path, tmp_path: Path):
+    qrc = QRC.replace("<file>icons/icon.png</file>", "<file>icons/icon.png</file><file>i18n/fi.qm</file>")
+    (plugin_package / "resources" / "resources.qrc").write_text(qrc, encoding="utf-8")
+
+    output = _run(plugin_package, "build", "--jobs", "2")
+
+    assert _tool_calls(tmp_path) == ["lrelease", "pyrcc5"]
+    assert output[-1].startswith(f"Critical path: {plugin_package}/resources/i18n/fi.qm -> resources/resources.py (")
+
+    (plugin_package / "resources" / "i18n" / "fi.ts").write_text("<TS></TS>", encoding="utf-8")
+    _run(plugin_package, "build")
+
+    assert _tool_calls(tmp_path) == ["lrelease", "pyrcc5"]
+
+
+def test_failed_job_is_run_again(plugin_package: Path, tmp_path: Path):
+    (plugin_package / "resources" / "i18n" / "fi.ts").unlink()
+
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        _run(plugin_package, "build")
+
+    assert "Stopping now due to error in stderr!" in exc_info.value.output
+    assert sorted(_tool_calls(tmp_path)) == ["lrelease", "pyrcc5"]
+    (plugin_package / "resources" / "i18n" / "fi.ts").write_text("<TS/>", encoding="utf-8")
+    _run(plugin_package, "build")
+    assert _tool_calls(tmp_path) == ["lrelease"]
@@ -1,35 +1,41 @@
 from __future__ import annotations
 
 import copy
-import subprocess
-import sys
+import itertools
+import json
+import os
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 import pytest
-from cookiecutter.exceptions import FailedHookException, UndefinedVariableInTemplate
+from cookiecutter.exceptions import FailedHookException
 
-from tests.testing_utils import processing_directory_exitst
+from tests.bake_matrix import BAKE_CACHE_DIR_VARIABLE, BakedProject, BakeMatrix
+from tests.combinations import covering_combinations, invalid_values, option_values
+from tests.testing_utils import commit_file, processing_directory_exitst, run_git
 
 if TYPE_CHECKING:
-    from pathlib import Path
+    from pytest_cookies.plugin import Cookies
 
-    from pytest_cookies.plugin import Cookies, Result
+
+SESSION_CONTEXT = {
+    "plugin_name": "My QGIS plugin",
+    "project_directory": "my-qgis-plugin",
+    "plugin_package": "plugin",
+    "git_repo_organization": "my-org",
+    "git_repo_url": "https://github.com/my-org/my-qgis-plugin",
+    "ci_provider": "None",
+    "add_vscode_config": False,
+    "include_processing": False,
+    "license": "GPL2",
+    "use_qgis_plugin_tools": False,  # to make test run faster
+    "linting": "hatch",
+}
 
 
 @pytest.fixture(scope="session")
 def session_context():
-    return {
-        "plugin_name": "My QGIS plugin",
-        "project_directory": "my-qgis-plugin",
-        "plugin_package": "plugin",
-        "git_repo_organization": "my-org",
-        "git_repo_url": "https://github.com/my-org/my-qgis-plugin",
-        "ci_provider": "None",
-        "add_vscode_config": False,
-        "include_processing": False,
-        "license": "GPL2",
-        "use_qgis_plugin_tools": False,  # to make test run faster
-    }
+    return SESSION_CONTEXT
 
 
 @pytest.fixture
@@ -37,79 +43,97 @@ def context(session_context: dict[str, str]):
     return copy.deepcopy(session_context)
 
 
-SUPPORTED_COMBINATIONS = [
-    {},  # test with default values
-    {"ci_provider": "None"},
-    {"add_vscode_config": True},
-    {"include_processing": True},
-    {"use_qgis_plugin_tools": True, "include_processing": True},
-    {"use_qgis_plugin_tools": True, "include_processing": False},
-    {"license": "GPL3"},
-]
+# Every value of each option is baked with every value of each other
+# option at least once, with the options in SESSION_CONTEXT as the default
+SUPPORTED_COMBINATIONS = covering_combinations(SESSION_CONTEXT)
+
+UNSUPPORTED_COMBINATIONS = invalid_values(SESSION_CONTEXT)
+
+OPT_IN_FEATURES_REMOVED = {
+    "ci_provider": "None",
+    "add_vscode_config": False,
+    "include_processing": False,
+    "license": "GPL2",
+    "use_qgis_plugin_tools": False,
+}
+
+OPT_IN_FEATURES_INCLUDED = {
+    "ci_provider": "GitHub",
+    "add_vscode_config": True,
+    "include_processing": True,
+    "license": "GPL2",
+    "use_qgis_plugin_tools": True,
+}
 
-UNSUPPORTED_COMBINATIONS = [
-    {"license": "other"},
-]
+
+def test_combinations_cover_all_pairs():
+    """Each value of every option should be baked together with each value of every other option."""
+    options = {
+        name: [value for value in values if {name: value} not in UNSUPPORTED_COMBINATIONS]
+        for name, values in option_values().items()
+    }
+    for (name, values), (other_name, other_values) in itertools.combinations(options.items(), 2):
+        for value, other_value in itertools.product(values, other_values):
+            assert any(
+                combination[name] == value and combination[other_name] == other_value
+                for combination in SUPPORTED_COMBINATIONS
+            ), f"{name}={value} and {other_name}={other_value} are never baked together"
+
+
+@pytest.fixture(scope="session")
+def bake_matrix(tmp_path_factory: pytest.TempPathFactory) -> BakeMatrix:
+    """All the projects the tests share, baked at once. Identical contexts are baked only once."""
+    cache_dir = os.environ.get(BAKE_CACHE_DIR_VARIABLE)
+    if cache_dir is None:
+        # The temporary directories of the xdist workers share a parent
+        base = tmp_path_factory.getbasetemp()
+        cache_dir = (base.parent if "PYTEST_XDIST_WORKER" in os.environ else base) / "bakes"
+    contexts = [
+        {**SESSION_CONTEXT, **overrides}
+        for overrides in (*SUPPORTED_COMBINATIONS, OPT_IN_FEATURES_REMOVED, OPT_IN_FEATURES_INCLUDED)
+    ]
+    return BakeMatrix(Path(cache_dir), contexts)
 
 
 def _fixture_id(ctx: dict[str, str]):
     """Helper to get a user friendly test name from the parametrized context."""
-    if not ctx:
+    changed = {key: value for key, value in ctx.items() if SESSION_CONTEXT.get(key) != value}
+    if not changed:
         return "default"
-    return "-".join(f"{key}:{value}" for key, value in ctx.items())
+    return "-".join(f"{key}:{value}" for key, value in changed.items())
 
 
 @pytest.fixture(scope="session", params=SUPPORTED_COMBINATIONS, ids=_fixture_id)
 def baked_project(
-    cookies_session: Cookies,
+    bake_matrix: BakeMatrix,
     session_context: dict[str, str],
     request: pytest.FixtureRequest,
-) -> Result:
+) -> BakedProject:
     context_override = request.param
-    baked_project = cookies_session.bake(extra_context={**session_context, **context_override})
-    if isinstance(baked_project.exception, UndefinedVariableInTemplate):
-        print(baked_project.exception.message)  # noqa: T201
-        print(f"Error message: {baked_project.exception.error.message}")  # noqa: T201
-        pytest.fail("Undefined variable in template")
-
-    return baked_project
+    return bake_matrix[{**session_context, **context_override}]
 
 
-def test_project_generation(baked_project: Result):
+def test_project_generation(baked_project: BakedProject):
     """Test that project is generated and fully rendered."""
 
-    assert baked_project.exit_code == 0
-    assert baked_project.exception is None
+    assert baked_project.error is None, baked_project.error
 
     assert baked_project.project_path.name == baked_project.context["project_directory"]
     assert baked_project.project_path.is_dir()
 
 
-def run_cli_command(args: list[str], cwd: str):
-    try:
-        subprocess.check_output(
-            args,
-            cwd=cwd,
-            timeout=20,
-            universal_newlines=True,
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError as exc:
-        pytest.fail(exc.output)
-    except subprocess.TimeoutExpired:
-        pytest.fail("Command timeouted")
-
-
-def test_ruff_linting_passes(baked_project: Result):
+def test_ruff_linting_passes(baked_project: BakedProject, bake_matrix: BakeMatrix):
     """Generated project should pass ruff check."""
 
-    run_cli_command([sys.executable, "-m", "ruff", "check", "."], cwd=str(baked_project.project_path))
+    violations = bake_matrix.lint(baked_project)["check"]
+    assert not violations, "\n".join(violations)
 
 
-def test_ruff_formatting_passes(baked_project: Result):
+def test_ruff_formatting_passes(baked_project: BakedProject, bake_matrix: BakeMatrix):
     """Generated project should pass ruff formatting."""
 
-    run_cli_command([sys.executable, "-m", "ruff", "format", "--check", "."], cwd=str(baked_project.project_path))
+    unformatted = bake_matrix.lint(baked_project)["format"]
+    assert not unformatted, "\n".join(unformatted)
 
 
 @pytest.mark.parametrize("package_name", ["invalid name", "1plugin"])
@@ -133,34 +157,98 @@ def test_error_if_incompatible(cookies: Cookies, context: dict[str, str], invali
     assert isinstance(result.exception, FailedHookException)
 
 
+def test_pinned_plugin_tools_ref(cookies: Cookies, context: dict[str, str], qgis_plugin_tools_repository: Path):
+    """The submodule should be checked out at the pinned commit, which is fetched to the mirror if needed."""
+    pinned = commit_file(qgis_plugin_tools_repository, "pinned.txt", "pinned\n")
+    commit_file(qgis_plugin_tools_repository, "later.txt", "later\n")
+    context.update({"use_qgis_plugin_tools": True, "_qgis_plugin_tools_ref": pinned})
+
+    result = cookies.bake(extra_context=context)
+
+    submodule = result.project_path / context["plugin_package"] / "qgis_plugin_tools"
+    assert run_git(["rev-parse", "HEAD"], submodule) == pinned
+    assert (submodule / "pinned.txt").exists()
+    assert not (submodule / "later.txt").exists()
+
+
+def test_plugin_tools_mirror_is_created(
+    cookies: Cookies,
+    context: dict[str, str],
+    qgis_plugin_tools_repository: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """The mirror should be cloned to an empty cache directory, and only the mirror should be left there."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("QGIS_PLUGIN_TOOLS_CACHE_DIR", str(cache_dir))
+    monkeypatch.setenv("QGIS_PLUGIN_TOOLS_MIRROR_URL", str(qgis_plugin_tools_repository))
+    context.update({"use_qgis_plugin_tools": True})
+
+    result = cookies.bake(extra_context=context)
+
+    assert result.exit_code == 0
+    assert [path.name for path in cache_dir.iterdir()] == ["qgis_plugin_tools.git"]
+    submodule = result.project_path / context["plugin_package"] / "qgis_plugin_tools"
+    assert run_git(["rev-parse", "HEAD"], submodule) == run_git(["rev-parse", "HEAD"], qgis_plugin_tools_repository)
+
+
+def test_step_timings(
+    cookies: Cookies, context: dict[str, str], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The hook should write the time of each step it ran."""
+    timings_file = tmp_path / "timings.json"
+    monkeypatch.setenv("POST_GEN_TIMINGS_FILE", str(timings_file))
+    context.update({"use_qgis_plugin_tools": False, "include_processing": False})
+
+    result = cookies.bake(extra_context=context)
+
+    assert result.exit_code == 0
+    timings = json.loads(timings_file.read_text(encoding="utf-8"))
+    assert {"apply_plan", "git_init", "git_commit", "steps", "total"} <= set(timings)
+    assert "add_plugin_tools" not in timings
+    assert timings["steps"] <= timings["total"]
+
+
+def test_dry_run(
+    cookies: Cookies, context: dict[str, str], monkeypatch: pytest.MonkeyPatch, capfd: pytest.CaptureFixture[str]
+) -> None:
+    """In a dry run the hook should print the planned changes without applying them."""
+    monkeypatch.setenv("POST_GEN_DRY_RUN", "1")
+    context.update({"include_processing": False})
+
+    result = cookies.bake(extra_context=context)
+
+    report = capfd.readouterr().out.splitlines()
+    package = context["plugin_package"]
+    assert f"remove {package}/{package}_processing/" in report
+    assert "remove licenses/" in report
+    assert "rename pyproject.toml.j2 -> pyproject.toml" in report
+    assert not any(line.startswith(f"rename {package}/{package}_processing/") for line in report)
+    assert (result.project_path / "licenses").is_dir()
+    assert (result.project_path / "pyproject.toml.j2").exists()
+    assert not (result.project_path / ".git").exists()
+
+
 class TestOptInFeaturesRemoved:
     @pytest.fixture(scope="class")
-    def baked_project(self, cookies_session: Cookies) -> Result:
-        extra_context = {
-            "plugin_name": "My QGIS plugin",
-            "ci_provider": "None",
-            "add_vscode_config": False,
-            "include_processing": False,
-            "license": "GPL2",
-            "use_qgis_plugin_tools": False,
-        }
-        return cookies_session.bake(extra_context=extra_context)
+    def baked_project(self, bake_matrix: BakeMatrix) -> BakedProject:
+        return bake_matrix[{**SESSION_CONTEXT, **OPT_IN_FEATURES_REMOVED}]
 
     @pytest.fixture(scope="class")
-    def project_path(self, baked_project: Result) -> Path:
-        assert baked_project.project_path
+    def project_path(self, baked_project: BakedProject) -> Path:
+        assert baked_project.error is None, baked_project.error
         return baked_project.project_path
 
-    def test_no_vscode(self, baked_project: Result, project_path: Path) -> None:
+    def test_no_vscode(self, baked_project: BakedProject, project_path: Path) -> None:
         assert not (project_path / f"{baked_project.context['project_directory']}.code-workspace").exists()
 
     def test_no_github(self, project_path: Path) -> None:
         assert not (project_path / ".github").is_dir()
 
-    def test_no_processing(self, baked_project: Result, project_path: Path) -> None:
+    def test_no_processing(self, baked_project: BakedProject, project_path: Path) -> None:
         assert not processing_directory_exitst(baked_project, project_path)
 
-    def test_no_plugin_tools(self, baked_project: Result, project_path: Path) -> None:
+    def test_no_plugin_tools(self, baked_project: BakedProject, project_path: Path) -> None:
         assert not (project_path / baked_project.context["plugin_package"] / "qgis_plugin_tools").is_dir()
 
     def test_no_licenses_dir(self, project_path: Path) -> None:
@@ -169,33 +257,30 @@ class TestOptInFeaturesRemoved:
 
 class TestOptInFeaturesIncluded:
     @pytest.fixture(scope="class")
-    def baked_project(self, cookies_session: Cookies) -> Result:
-        extra_context = {
-            "plugin_name": "My QGIS plugin",
-            "ci_provider": "GitHub",
-            "add_vscode_config": True,
-            "include_processing": True,
-            "license": "GPL2",
-            "use_qgis_plugin_tools": True,
-        }
-        return cookies_session.bake(extra_context=extra_context)
+    def baked_project(self, bake_matrix: BakeMatrix) -> BakedProject:
+        return bake_matrix[{**SESSION_CONTEXT, **OPT_IN_FEATURES_INCLUDED}]
 
     @pytest.fixture(scope="class")
-    def project_path(self, baked_project: Result) -> Path:
-        assert baked_project.project_path
+    def project_path(self, baked_project: BakedProject) -> Path:
+        assert baked_project.error is None, baked_project.error
         return baked_project.project_path
 
-    def test_has_vscode(self, baked_project: Result, project_path: Path) -> None:
+    def test_has_vscode(self, baked_project: BakedProject, project_path: Path) -> None:
         assert (project_path / f"{baked_project.context['project_directory']}.code-workspace").exists()
 
     def test_has_github(self, project_path: Path) -> None:
         assert (project_path / ".github").is_dir()
 
-    def test_has_processing(self, baked_project: Result, project_path: Path) -> None:
+    def test_has_processing(self, baked_project: BakedProject, project_path: Path) -> None:
         assert processing_directory_exitst(baked_project, project_path)
 
-    def test_has_plugin_tools(self, baked_project: Result, project_path: Path) -> None:
+    def test_has_plugin_tools(self, baked_project: BakedProject, project_path: Path) -> None:
         assert (project_path / baked_project.context["plugin_package"] / "qgis_plugin_tools").is_dir()
 
+    def test_plugin_tools_url_is_upstream(self, project_path: Path) -> None:
+        gitmodules = (project_path / ".gitmodules").read_text(encoding="utf-8")
+
+        assert "url = https://github.com/GispoCoding/qgis_plugin_tools" in gitmodules
+
     def test_no_licenses_dir(self, project_path: Path) -> None:
         assert not (project_path / "licenses").is_dir()
@@ -0,0 +1,457 @@
+# The discovery of the installations is private to the script
+# ruff: noqa: SLF001
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from tests.bake_matrix import TEMPLATE_DIR
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+SCRIPT = TEMPLATE_DIR / "{{cookiecutter.project_directory}}" / "create_qgis_venv.py"
+
+# Creates a tree like the one of a virtual environment instead of a real one
+FAKE_PYTHON = """\
+import os
+import shutil
+import sys
+from pathlib import Path
+
+with open(os.environ["FAKE_PYTHON_LOG"], "a") as log:
+    log.write(" ".join(sys.argv[1:]) + "\\n")
+if sys.argv[1] == "-c":
+    print("cpython-311 linux-x86_64")
+elif sys.argv[1:3] == ["-m", "venv"]:
+    venv = Path(sys.argv[-1])
+    (venv / "bin").mkdir(parents=True)
+    (venv / "lib" / "site-packages" / "package" / "__pycache__").mkdir(parents=True)
+    (venv / "lib64").symlink_to("lib")
+    (venv / "pyvenv.cfg").write_text(f"command = python -m venv {venv}\\n")
+    (venv / "bin" / "activate").write_text(f'VIRTUAL_ENV="{venv}"\\nPS1="({venv.name}) "\\n')
+    shutil.copy(sys.argv[0], venv / "bin" / "python")
+    (venv / "lib" / "site-packages" / "package" / "__init__.py").write_text("")
+    (venv / "lib" / "site-packages" / "package" / "__pycache__" / "__init__.pyc").write_text(str(venv))
+elif sys.argv[1:3] == ["-m", "piptools"]:
+    Path(sys.argv[sys.argv.index("--output-file") + 1]).write_text("pytest==8.0.0\\n")
+elif any(arg.startswith("broken") for arg in sys.argv) or (
+    "--no-index" in sys.argv and "wheel" in sys.argv and os.environ.get("FAKE_PIP_MISSING_DEPENDENCIES")
+):
+    sys.exit(1)
+else:
+    tool = Path(sys.argv[0]).parent / "tool"
+    tool.write_text(f"#!{Path(sys.argv[0]).parent / 'python'}\\n")
+    tool.chmod(0o755)
+"""
+
+
+@pytest.fixture(scope="module")
+def create_qgis_venv() -> ModuleType:
+    spec = importlib.util.spec_from_file_location("create_qgis_venv", SCRIPT)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("QGIS_VENV_CREATOR_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+def _executable(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("", encoding="utf-8")
+    path.chmod(0o755)
+
+
+def _linux_installation(prefix: Path) -> Path:
+    _executable(prefix / "bin" / "qgis")
+    _executable(prefix / "bin" / "python3")
+    return prefix
+
+
+def _windows_installation(root: Path, name: str = "qgis") -> Path:
+    for directory in ("bin", f"apps/{name}/bin", "apps/Qt5/bin"):
+        (root / directory).mkdir(parents=True, exist_ok=True)
+    _executable(root / "apps" / "Python39" / "python.exe")
+    return root / "apps" / name
+
+
+@pytest.fixture
+def linux(create_qgis_venv: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> type:
+    patterns = (f"{tmp_path}/usr/", f"{tmp_path}/opt/*/")
+    monkeypatch.setattr(create_qgis_venv.Linux, "QGIS_INSTALLATION_SEARCH_PATH_PATTERNS", patterns)
+    return create_qgis_venv.Linux
+
+
+def _fail_search(create_qgis_venv: ModuleType, monkeypatch: pytest.MonkeyPatch) -> None:
+    def scandir(path: str) -> None:
+        pytest.fail(f"{path} was searched")
+
+    monkeypatch.setattr(create_qgis_venv.os, "scandir", scandir)
+
+
+def test_linux_installations_are_found(linux: type, tmp_path: Path):
+    usr = _linux_installation(tmp_path / "usr")
+    opt_qgis = _linux_installation(tmp_path / "opt" / "qgis")
+    _executable(tmp_path / "opt" / "python" / "bin" / "python3")
+
+    assert linux._find_qgis_installations() == [usr, opt_qgis]
+    assert linux._qgis_python_executable(opt_qgis) == opt_qgis / "bin" / "python3"
+
+
+def test_custom_search_path_pattern(linux: type, tmp_path: Path):
+    conda_env = _linux_installation(tmp_path / "conda" / "envs" / "qgis")
+
+    assert linux._find_qgis_installations(f"{tmp_path}/conda/envs/*/") == [conda_env]
+
+
+def test_search_results_are_cached(
+    create_qgis_venv: ModuleType, linux: type, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, cache_dir: Path
+):
+    opt_qgis = _linux_installation(tmp_path / "opt" / "qgis")
+    linux._find_qgis_installations()
+    _fail_search(create_qgis_venv, monkeypatch)
+
+    assert linux._find_qgis_installations() == [opt_qgis]
+    assert (cache_dir / "qgis_installations.json").is_file()
+
+
+def test_cache_is_invalidated_by_new_installation(linux: type, tmp_path: Path):
+    opt_qgis = _linux_installation(tmp_path / "opt" / "qgis")
+    linux._find_qgis_installations()
+    usr = _linux_installation(tmp_path / "usr")
+    opt_qgis_ltr = _linux_installation(tmp_path / "opt" / "qgis-ltr")
+
+    assert linux._find_qgis_installations() == [usr, opt_qgis, opt_qgis_ltr]
+
+
+def test_cache_is_invalidated_by_broken_installation(linux: type, tmp_path: Path):
+    opt_qgis = _linux_installation(tmp_path / "opt" / "qgis")
+    linux._find_qgis_installations()
+    (opt_qgis / "bin" / "qgis").unlink()
+
+    assert linux._find_qgis_installations() == []
+
+
+def test_corrupted_cache_is_ignored(linux: type, tmp_path: Path, cache_dir: Path):
+    opt_qgis = _linux_installation(tmp_path / "opt" / "qgis")
+    cache_dir.mkdir()
+    (cache_dir / "qgis_installations.json").write_text("{", encoding="utf-8")
+
+    assert linux._find_qgis_installations() == [opt_qgis]
+
+
+def test_windows_installations_are_found(create_qgis_venv: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    windows = create_qgis_venv.Windows
+    patterns = (f"{tmp_path}/Program Files/QGIS*/apps/qgis*/", f"{tmp_path}/OSGeo4W/apps/qgis*/")
+    monkeypatch.setattr(windows, "QGIS_INSTALLATION_SEARCH_PATH_PATTERNS", patterns)
+    qgis = _windows_installation(tmp_path / "Program Files" / "QGIS 3.34.4")
+    qgis_ltr = _windows_installation(tmp_path / "OSGeo4W", "qgis-ltr")
+    (tmp_path / "OSGeo4W" / "apps" / "qgis-dev").mkdir()
+
+    assert windows._find_qgis_installations() == [qgis, qgis_ltr]
+    shutil.rmtree(tmp_path / "OSGeo4W" / "apps" / "Qt5")
+    assert windows._find_qgis_installations() == [qgis]
+
+
+def test_linux_venv_uses_found_installation(
+    create_qgis_venv: ModuleType, linux: type, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    opt_qgis = _linux_installation(tmp_path / "opt" / "qgis")
+    calls = []
+
+    def create_venv(python_executable: Path, *_args: object, **_kwargs: object) -> None:
+        calls.append(python_executable)
+
+    monkeypatch.setattr(create_qgis_venv, "_create_venv", create_venv)
+
+    linux.create_venv(venv_parent=tmp_path)
+
+    assert calls == [opt_qgis / "bin" / "python3"]
+
+
+@pytest.mark.benchmark
+def test_cached_search_is_faster(linux: type, tmp_path: Path):
+    for index in range(200):
+        _linux_installation(tmp_path / "opt" / f"qgis-{index}")
+        (tmp_path / "opt" / f"other-{index}" / "bin").mkdir(parents=True)
+
+    start = time.perf_counter()
+    assert len(linux._find_qgis_installations()) == 200
+    search_time = time.perf_counter() - start
+    start = time.perf_counter()
+    assert len(linux._find_qgis_installations()) == 200
+    cached_time = time.perf_counter() - start
+
+    print(f"\nSearch {search_time * 1000:.1f} ms, cached {cached_time * 1000:.1f} ms")  # noqa: T201
+    assert cached_time < search_time
+
+
+@pytest.fixture
+def fake_python(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A Python executable which logs its arguments to python.log."""
+    python = tmp_path / "fake" / "python"
+    _executable(python)
+    python.write_text(f"#!{sys.executable}\n{FAKE_PYTHON}", encoding="utf-8")
+    monkeypatch.setenv("FAKE_PYTHON_LOG", str(tmp_path / "python.log"))
+    return python
+
+
+def _fake_python_calls(tmp_path: Path) -> list[str]:
+    return (tmp_path / "python.log").read_text(encoding="utf-8").splitlines()
+
+
+def test_venv_is_cloned_from_golden_venv(create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("pytest\n", encoding="utf-8")
+    venvs = []
+    for project in ("first", "second"):
+        (tmp_path / project).mkdir()
+        venvs.append(
+            create_qgis_venv._create_venv(
+                fake_python, tmp_path / project, ".venv", requirements=requirements, clone_golden_venv=True
+            )
+        )
+
+    calls = _fake_python_calls(tmp_path)
+    assert len(calls) == 2
+    assert calls[0].startswith("-m venv --system-site-packages")
+    golden_venv = Path(calls[0].split()[-1])
+    assert calls[1] == f"-m pip install -r {requirements}"
+    for venv in venvs:
+        assert (venv / "bin" / "activate").read_text(encoding="utf-8") == f'VIRTUAL_ENV="{venv}"\nPS1="(.venv) "\n'
+        assert (venv / "bin" / "tool").read_text(encoding="utf-8") == f"#!{venv / 'bin' / 'python'}\n"
+        assert (venv / "pyvenv.cfg").read_text(encoding="utf-8") == f"command = python -m venv {venv}\n"
+        assert (venv / "lib64").is_symlink()
+        assert not (venv / "lib" / "site-packages" / "package" / "__pycache__").exists()
+        package = venv / "lib" / "site-packages" / "package" / "__init__.py"
+        assert package.stat().st_ino == (golden_venv / package.relative_to(venv)).stat().st_ino
+
+
+def test_golden_venv_is_created_for_each_requirements(create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("pytest\n", encoding="utf-8")
+    create_qgis_venv._create_venv(fake_python, tmp_path, "first", requirements=requirements, clone_golden_venv=True)
+    requirements.write_text("pytest\nruff\n", encoding="utf-8")
+
+    create_qgis_venv._create_venv(fake_python, tmp_path, "second", requirements=requirements, clone_golden_venv=True)
+
+    assert len(_fake_python_calls(tmp_path)) == 4
+
+
+def test_venv_is_not_cloned_over_existing_directory(create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path):
+    (tmp_path / ".venv").mkdir()
+
+    with pytest.raises(create_qgis_venv.VenvDirectoryExistsError):
+        create_qgis_venv._create_venv(fake_python, tmp_path, ".venv", clone_golden_venv=True)
+
+
+@pytest.mark.benchmark
+def test_cloned_venv_is_faster(create_qgis_venv: ModuleType, tmp_path: Path):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("", encoding="utf-8")
+    python = Path(sys.executable)
+    create_qgis_venv._create_venv(python, tmp_path, "golden", requirements=requirements, clone_golden_venv=True)
+
+    start = time.perf_counter()
+    created = create_qgis_venv._create_venv(python, tmp_path, "created", requirements=requirements)
+    create_time = time.perf_counter() - start
+    start = time.perf_counter()
+    cloned = create_qgis_venv._create_venv(
+        python, tmp_path, "cloned", requirements=requirements, clone_golden_venv=True
+    )
+    clone_time = time.perf_counter() - start
+
+    print(f"\nCreate {create_time:.2f} s, clone {clone_time:.2f} s")  # noqa: T201
+    for venv in (created, cloned):
+        prefix = subprocess.check_output(
+            [create_qgis_venv._venv_python_executable(venv), "-c", "import sys; print(sys.prefix)"], text=True
+        )
+        assert prefix.strip() == str(venv)
+    assert clone_time < create_time
+
+
+def _fake_linux_installation(prefix: Path, fake_python: Path) -> Path:
+    _executable(prefix / "bin" / "qgis")
+    shutil.copy(fake_python, prefix / "bin" / "python3")
+    return prefix
+
+
+def test_venv_matrix(linux: type, fake_python: Path, tmp_path: Path):
+    usr = _fake_linux_installation(tmp_path / "usr", fake_python)
+    opt_qgis = _fake_linux_installation(tmp_path / "opt" / "qgis", fake_python)
+    opt_qgis_ltr = _fake_linux_installation(tmp_path / "opt" / "qgis-ltr", fake_python)
+    (tmp_path / "project").mkdir()
+
+    entries = linux.create_venv_matrix(tmp_path / "project", ".venv", max_workers=3)
+
+    assert [entry["qgis_installation"] for entry in entries] == [str(usr), str(opt_qgis), str(opt_qgis_ltr)]
+    assert [entry["venv"] for entry in entries] == [
+        str(tmp_path / "project" / name) for name in (".venv-usr", ".venv-qgis", ".venv-qgis-ltr")
+    ]
+    assert entries[1]["python_executable"] == str(opt_qgis / "bin" / "python3")
+    assert all(entry["error"] is None for entry in entries)
+    assert sorted(_fake_python_calls(tmp_path)) == sorted(
+        f"-m venv --system-site-packages {entry['venv']}" for entry in entries
+    )
+
+
+@pytest.mark.usefixtures("linux")
+def test_venv_matrix_cli(
+    create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    _fake_linux_installation(tmp_path / "opt" / "qgis", fake_python)
+    broken = tmp_path / "opt" / "broken"
+    _executable(broken / "bin" / "qgis")
+    _executable(broken / "bin" / "python3")
+    (broken / "bin" / "python3").write_text("#!/bin/sh\nexit 1\n", encoding="utf-8")
+    manifest = tmp_path / "venvs.json"
+    monkeypatch.setattr(create_qgis_venv.platform, "system", lambda: "Linux")
+    project = tmp_path / "project"
+    project.mkdir()
+    argv = ["create_qgis_venv.py", "--venv-parent", str(project), "--matrix", "--manifest", str(manifest)]
+    monkeypatch.setattr(sys, "argv", argv)
+
+    with pytest.raises(SystemExit) as exc_info:
+        create_qgis_venv.cli()
+
+    assert exc_info.value.code == 1
+    entries = {Path(entry["qgis_installation"]).name: entry for entry in json.loads(manifest.read_text())["venvs"]}
+    assert entries["broken"]["error"] == "Failed to create virtual environment"
+    assert entries["qgis"]["venv"] == str(project / ".venv-qgis")
+    assert entries["qgis"]["error"] is None
+
+
+def test_venv_names_tell_installations_apart(create_qgis_venv: ModuleType):
+    installations = [
+        Path("/opt/QGIS 3.34/apps/qgis"),
+        Path("/opt/QGIS 3.36/apps/qgis"),
+        Path("/opt/OSGeo4W/apps/qgis-ltr"),
+    ]
+
+    assert list(create_qgis_venv._venv_name_suffixes(installations).values()) == [
+        "qgis-3.34-apps-qgis",
+        "qgis-3.36-apps-qgis",
+        "osgeo4w-apps-qgis-ltr",
+    ]
+
+
+REQUIREMENTS = """\
+# Testing
+pytest==8.0.0  # via -r requirements-dev.in
+ruff==0.4.0 \\
+    --hash=sha256:0123
+--index-url https://pypi.org/simple
+"""
+
+
+def test_requirements_are_installed_from_wheelhouse(create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text(REQUIREMENTS, encoding="utf-8")
+    wheelhouse = tmp_path / "wheelhouse"
+
+    for name in ("first", "second"):
+        create_qgis_venv._create_venv(fake_python, tmp_path, name, requirements=requirements, wheelhouse=wheelhouse)
+
+    wheels = next(wheelhouse.glob("*/wheels"))
+    assert (wheels.parent / "cpython-311-linux-x86-64.json").is_file()
+    pip_calls = [call for call in _fake_python_calls(tmp_path) if call.startswith("-m pip")]
+    install = f"-m pip install --no-index --find-links {wheels} -r {requirements}"
+    assert sorted(pip_calls[:2]) == [
+        f"-m pip wheel --no-deps --wheel-dir {wheels} pytest==8.0.0",
+        f"-m pip wheel --no-deps --wheel-dir {wheels} ruff==0.4.0",
+    ]
+    assert pip_calls[2:] == [
+        f"-m pip wheel --no-index --wheel-dir {wheels} --find-links {wheels} -r {requirements}",
+        install,
+        install,
+    ]
+
+
+def test_empty_requirements_are_compiled(create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("", encoding="utf-8")
+    (tmp_path / "requirements-dev.in").write_text("pytest\n", encoding="utf-8")
+
+    for name in ("first", "second"):
+        create_qgis_venv._create_venv(fake_python, tmp_path, name, requirements=requirements)
+
+    assert requirements.read_text(encoding="utf-8") == "pytest==8.0.0\n"
+    compile_calls = [call for call in _fake_python_calls(tmp_path) if call.startswith("-m piptools compile")]
+    assert compile_calls == [
+        f"-m piptools compile --quiet --output-file {requirements} {tmp_path / 'requirements-dev.in'}"
+    ]
+
+
+def test_dependencies_not_listed_are_built_to_wheelhouse(
+    create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("FAKE_PIP_MISSING_DEPENDENCIES", "1")
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("pytest\n", encoding="utf-8")
+    wheelhouse = tmp_path / "wheelhouse"
+
+    create_qgis_venv._create_venv(fake_python, tmp_path, "first", requirements=requirements, wheelhouse=wheelhouse)
+
+    wheels = next(wheelhouse.glob("*/wheels"))
+    pip_calls = [call for call in _fake_python_calls(tmp_path) if call.startswith("-m pip wheel")]
+    assert pip_calls == [
+        f"-m pip wheel --no-deps --wheel-dir {wheels} pytest",
+        f"-m pip wheel --no-index --wheel-dir {wheels} --find-links {wheels} -r {requirements}",
+        f"-m pip wheel --wheel-dir {wheels} --find-links {wheels} -r {requirements}",
+    ]
+
+
+def test_wheelhouse_is_not_completed_when_wheel_build_fails(
+    create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path
+):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("pytest\nbroken==1.0\n", encoding="utf-8")
+    wheelhouse = tmp_path / "wheelhouse"
+
+    with pytest.raises(create_qgis_venv.VenvCreationError):
+        create_qgis_venv._create_venv(fake_python, tmp_path, "first", requirements=requirements, wheelhouse=wheelhouse)
+
+    assert not list(wheelhouse.glob("*/*.json"))
+    assert not [call for call in _fake_python_calls(tmp_path) if "-r" in call.split()]
+
+
+def test_wheelhouse_requires_requirements(
+    create_qgis_venv: ModuleType, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    monkeypatch.setattr(create_qgis_venv.platform, "system", lambda: "Linux")
+    monkeypatch.setattr(sys, "argv", ["create_qgis_venv.py", "--wheelhouse"])
+
+    with pytest.raises(SystemExit) as exc_info:
+        create_qgis_venv.cli()
+
+    assert exc_info.value.code == 2
+    assert "--wheelhouse requires --requirements" in capsys.readouterr().err
+
+
+def test_wheelhouse_is_built_for_each_requirements(create_qgis_venv: ModuleType, fake_python: Path, tmp_path: Path):
+    requirements = tmp_path / "requirements-dev.txt"
+    requirements.write_text("pytest\n", encoding="utf-8")
+    wheelhouse = tmp_path / "wheelhouse"
+    create_qgis_venv._create_venv(fake_python, tmp_path, "first", requirements=requirements, wheelhouse=wheelhouse)
+    requirements.write_text("pytest\nruff\n", encoding="utf-8")
+
+    create_qgis_venv._create_venv(fake_python, tmp_path, "second", requirements=requirements, wheelhouse=wheelhouse)
+
+    assert len(list(wheelhouse.glob("*/wheels"))) == 2
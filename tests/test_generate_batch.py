@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from generate_batch import InvalidContextsError, main, read_manifest, validate
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+YAML_MANIFEST = """\
+defaults:
+  git_repo_organization: my-org
+  ci_provider: "None"
+  use_qgis_plugin_tools: false
+plugins:
+  - plugin_name: First plugin
+  - plugin_name: Second plugin
+    license: GPL3
+    include_processing: true
+  - plugin_name: Third plugin
+    use_qgis_plugin_tools: true
+"""
+
+CSV_MANIFEST = """\
+plugin_name,license,include_processing
+First plugin,,yes
+Second plugin,GPL3,false
+"""
+
+
+def test_read_yaml_manifest(tmp_path: Path):
+    manifest = tmp_path / "plugins.yml"
+    manifest.write_text(YAML_MANIFEST, encoding="utf-8")
+
+    contexts = read_manifest(manifest)
+
+    assert len(contexts) == 3
+    assert contexts[0] == {
+        "git_repo_organization": "my-org",
+        "ci_provider": "None",
+        "use_qgis_plugin_tools": False,
+        "plugin_name": "First plugin",
+    }
+    assert contexts[2]["use_qgis_plugin_tools"] is True
+
+
+def test_read_csv_manifest(tmp_path: Path):
+    manifest = tmp_path / "plugins.csv"
+    manifest.write_text(CSV_MANIFEST, encoding="utf-8")
+
+    contexts = read_manifest(manifest)
+
+    assert contexts == [
+        {"plugin_name": "First plugin", "include_processing": True},
+        {"plugin_name": "Second plugin", "license": "GPL3", "include_processing": False},
+    ]
+
+
+def test_invalid_contexts_are_reported():
+    contexts = [
+        {"plugin_name": "First plugin"},
+        {"plugin_name": "Second plugin", "license": "other"},
+        {"plugin_name": "Third plugin", "linting": "strict"},
+        {"plugin_name": "Fourth plugin", "unknown_option": True},
+        {"plugin_name": "First plugin", "license": "GPL3"},
+    ]
+
+    with pytest.raises(InvalidContextsError) as exc_info:
+        validate(contexts)
+
+    errors = exc_info.value.errors
+    assert sorted(errors) == [1, 2, 3, 4]
+    assert "GPL version 2 or greater" in errors[1][0]
+    assert errors[2] == ["linting must be one of hatch, minimal, not strict"]
+    assert errors[3] == ["Unknown option unknown_option"]
+    assert errors[4] == ["The project directory first-plugin is also used by context 1"]
+
+
+def test_generate_batch(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    manifest = tmp_path / "plugins.yml"
+    manifest.write_text(YAML_MANIFEST, encoding="utf-8")
+    output_dir = tmp_path / "output"
+
+    exit_code = main([str(manifest), "--output-dir", str(output_dir), "--workers", "2"])
+
+    assert exit_code == 0
+    assert (output_dir / "first-plugin" / "firstplugin").is_dir()
+    assert (output_dir / "second-plugin" / "secondplugin" / "secondplugin_processing").is_dir()
+    assert (output_dir / "third-plugin" / "thirdplugin" / "qgis_plugin_tools").is_dir()
+    summary = capsys.readouterr().out
+    assert summary.count("generated") == 3
+    assert "failed" not in summary
+
+
+def test_invalid_manifest_generates_nothing(tmp_path: Path):
+    manifest = tmp_path / "plugins.yml"
+    manifest.write_text(YAML_MANIFEST + "  - plugin_name: Fourth plugin\n    license: other\n", encoding="utf-8")
+    output_dir = tmp_path / "output"
+
+    exit_code = main([str(manifest), "--output-dir", str(output_dir)])
+
+    assert exit_code == 2
+    assert not output_dir.exists()
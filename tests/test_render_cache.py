@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import filecmp
+from typing import TYPE_CHECKING
+
+import pytest
+from jinja2 import DictLoader, Environment, StrictUndefined
+
+from render_cache import (
+    RENDER_CACHE_DIR_VARIABLE,
+    RENDER_CACHE_SIZE_VARIABLE,
+    RENDER_CACHE_VARIABLE,
+    RenderCache,
+    RenderCacheExtension,
+)
+from tests.test_cookiecutter_generation import SESSION_CONTEXT
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pytest_cookies.plugin import Cookies
+
+TEMPLATES = {
+    "name.txt": "{{ cookiecutter.plugin_name }}",
+    "license.txt": "{% include 'licenses/' ~ cookiecutter.license ~ '.txt' %}",
+    "readme.txt": "{% include 'header.txt' %}{{ cookiecutter.plugin_name }}",
+    "header.txt": "# Header\n",
+    "random.txt": "{{ lipsum(1) }}",
+    "context.txt": "{{ cookiecutter | length }}",
+}
+
+CONTEXT = {"plugin_name": "My plugin", "license": "GPL2", "linting": "hatch"}
+
+
+@pytest.fixture
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> RenderCache:
+    monkeypatch.setenv(RENDER_CACHE_VARIABLE, "1")
+    monkeypatch.setenv(RENDER_CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    cache = RenderCache.from_environment()
+    assert cache is not None
+    return cache
+
+
+@pytest.fixture
+def templates() -> dict[str, str]:
+    return dict(TEMPLATES)
+
+
+def _render(templates: dict[str, str], name: str, **context: str) -> str:
+    environment = Environment(
+        loader=DictLoader(templates), extensions=[RenderCacheExtension], undefined=StrictUndefined
+    )
+    return environment.get_template(name).render(cookiecutter={**CONTEXT, **context})
+
+
+def test_rendered_file_is_cached(cache: RenderCache, templates: dict[str, str]):
+    assert _render(templates, "name.txt") == "My plugin"
+    assert _render(templates, "name.txt") == "My plugin"
+
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+
+def test_key_has_only_the_referred_variables(cache: RenderCache, templates: dict[str, str]):
+    _render(templates, "name.txt")
+    _render(templates, "name.txt", linting="minimal")
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+    assert _render(templates, "name.txt", plugin_name="Other") == "Other"
+    assert cache.stats.misses == 2
+
+
+def test_whole_context_is_in_the_key_if_it_is_used_as_a_whole(cache: RenderCache, templates: dict[str, str]):
+    assert _render(templates, "context.txt") == "3"
+    assert _render(templates, "context.txt", other="value") == "4"
+
+    assert cache.stats.misses == 2
+
+
+def test_included_files_are_in_the_key(cache: RenderCache, templates: dict[str, str]):
+    _render(templates, "readme.txt")
+    templates["header.txt"] = "# Changed\n"
+
+    assert _render(templates, "readme.txt") == "# ChangedMy plugin"
+    assert cache.stats.misses == 2
+
+
+def test_changed_source_is_rendered(cache: RenderCache, templates: dict[str, str]):
+    _render(templates, "name.txt")
+    templates["name.txt"] = "Plugin {{ cookiecutter.plugin_name }}"
+
+    assert _render(templates, "name.txt") == "Plugin My plugin"
+    assert cache.stats.misses == 2
+
+
+@pytest.mark.parametrize("name", ["license.txt", "random.txt"])
+def test_uncacheable_templates_are_rendered(cache: RenderCache, templates: dict[str, str], name: str):
+    templates["licenses/GPL2.txt"] = "GPL2"
+
+    _render(templates, name)
+    _render(templates, name)
+
+    assert cache.stats.uncacheable == 2
+    assert cache.stats.hits == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache: RenderCache, templates: dict[str, str]):
+    cache.max_size = 200
+    for index in range(20):
+        _render(templates, "name.txt", plugin_name=f"Plugin {index:03}")
+
+    assert cache.stats.evictions > 0
+    assert sum(path.stat().st_size for path in cache.directory.glob("entries/*/*")) <= cache.max_size
+    # The most recently rendered file is still in the cache
+    _render(templates, "name.txt", plugin_name="Plugin 019")
+    assert cache.stats.hits == 1
+
+
+def test_stats_are_reported(cache: RenderCache, templates: dict[str, str]):
+    _render(templates, "name.txt")
+    _render(templates, "name.txt")
+    cache.save_stats()
+
+    report = cache.report()
+
+    assert "Hits: 1\n" in report
+    assert "Misses: 1\n" in report
+    assert "Hit rate: 50%\n" in report
+
+
+def test_cached_bake_is_identical(cookies: Cookies, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """A project baked from the cache should be identical to one baked without the cache."""
+    monkeypatch.setenv(RENDER_CACHE_VARIABLE, "1")
+    monkeypatch.setenv(RENDER_CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+    context = {**SESSION_CONTEXT, "include_processing": True}
+    cached = [cookies.bake(extra_context=context).project_path for _ in range(2)]
+    monkeypatch.setenv(RENDER_CACHE_SIZE_VARIABLE, "0")
+    uncached = cookies.bake(extra_context=context).project_path
+
+    assert RenderCache.from_environment() is None
+    for project_path in cached:
+        comparison = filecmp.dircmp(project_path, uncached, ignore=[".git", ".cookiecutter-qgis-plugin.json"])
+        assert _differences(comparison) == []
+
+
+def _differences(comparison: filecmp.dircmp[str]) -> list[str]:
+    differences = [*comparison.left_only, *comparison.right_only, *comparison.diff_files]
+    for subdirectory in comparison.subdirs.values():
+        differences.extend(_differences(subdirectory))
+    return differences
+
+
+def test_cache_is_opt_in(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, templates: dict[str, str]):
+    monkeypatch.delenv(RENDER_CACHE_VARIABLE, raising=False)
+    monkeypatch.setenv(RENDER_CACHE_DIR_VARIABLE, str(tmp_path / "cache"))
+
+    assert _render(templates, "name.txt") == "My plugin"
+
+    assert not (tmp_path / "cache").exists()
+
+
+def test_disabled_extension_leaves_environment_unchanged(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv(RENDER_CACHE_VARIABLE, raising=False)
+
+    environment = Environment(loader=DictLoader(TEMPLATES), extensions=[RenderCacheExtension])
+
+    assert "get_template" not in vars(environment)
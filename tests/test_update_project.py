@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import shutil
+from typing import TYPE_CHECKING
+
+import pytest
+
+from tests.bake_matrix import TEMPLATE_DIR, TEMPLATE_PATHS
+from tests.test_cookiecutter_generation import SESSION_CONTEXT
+from tests.testing_utils import run_git
+from update_project import PROJECT_MANIFEST, render, update
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+PROCESSING_DIRECTORY = "plugin/plugin_processing"
+
+
+@pytest.fixture
+def template(tmp_path: Path) -> Path:
+    """A copy of the template in its own git repository."""
+    template = tmp_path / "template"
+    template.mkdir()
+    for name in TEMPLATE_PATHS:
+        source = TEMPLATE_DIR / name
+        if source.is_dir():
+            shutil.copytree(source, template / name, ignore=shutil.ignore_patterns("__pycache__"))
+        else:
+            shutil.copy2(source, template / name)
+    run_git(["init", "--quiet"], template)
+    _commit_template(template)
+    return template
+
+
+def _commit_template(template: Path) -> None:
+    run_git(["add", "."], template)
+    run_git(["commit", "--quiet", "-m", "Update template"], template)
+
+
+def _edit(path: Path, old: str, new: str) -> None:
+    content = path.read_text(encoding="utf-8")
+    assert old in content
+    path.write_text(content.replace(old, new, 1), encoding="utf-8")
+
+
+@pytest.fixture
+def project(template: Path, tmp_path: Path) -> Path:
+    return render(template, SESSION_CONTEXT, tmp_path / "project")
+
+
+def test_manifest_is_written(project: Path):
+    assert (project / PROJECT_MANIFEST).is_file()
+    assert not (project / ".git").exists()
+
+
+def test_up_to_date_project_is_not_changed(project: Path, template: Path):
+    result = update(project, template)
+
+    assert result.report() == ""
+
+
+def test_template_changes_are_applied(project: Path, template: Path):
+    project_directory = template / "{{cookiecutter.project_directory}}"
+    _edit(project_directory / "CHANGELOG.md", "# CHANGELOG\n", "# Changelog\n")
+    _edit(project_directory / "README.md.j2", "# {{cookiecutter.plugin_name}}\n", "# {{cookiecutter.plugin_name}}!\n")
+    (project_directory / "NEW.md").write_text("New file\n", encoding="utf-8")
+    _commit_template(template)
+    readme = project / "README.md"
+    readme.write_text(readme.read_text(encoding="utf-8") + "Edited in the project\n", encoding="utf-8")
+
+    result = update(project, template)
+
+    assert result.updated == ["CHANGELOG.md"]
+    assert result.added == ["NEW.md"]
+    assert result.merged == ["README.md"]
+    assert (project / "CHANGELOG.md").read_text(encoding="utf-8").startswith("# Changelog\n")
+    assert (project / "NEW.md").is_file()
+    merged = readme.read_text(encoding="utf-8")
+    assert merged.startswith("# My QGIS plugin!\n")
+    assert merged.endswith("Edited in the project\n")
+    assert update(project, template).report() == ""
+
+
+def test_conflicts_are_marked(project: Path, template: Path):
+    _edit(template / "{{cookiecutter.project_directory}}" / "CHANGELOG.md", "# CHANGELOG\n", "# Changelog\n")
+    _commit_template(template)
+    _edit(project / "CHANGELOG.md", "# CHANGELOG\n", "# Changes\n")
+
+    result = update(project, template)
+
+    assert result.conflicts == ["CHANGELOG.md"]
+    content = (project / "CHANGELOG.md").read_text(encoding="utf-8")
+    assert "<<<<<<< project\n# Changes\n" in content
+    assert "# Changelog\n>>>>>>> template\n" in content
+
+
+def test_options_can_be_changed(project: Path, template: Path):
+    result = update(project, template, {"include_processing": True})
+
+    assert any(path.startswith(PROCESSING_DIRECTORY) for path in result.added)
+    assert (project / PROCESSING_DIRECTORY).is_dir()
+
+
+def test_dry_run_does_not_change_the_project(project: Path, template: Path):
+    manifest = (project / PROJECT_MANIFEST).read_text(encoding="utf-8")
+
+    result = update(project, template, {"include_processing": True}, dry_run=True)
+
+    assert result.added
+    assert not (project / PROCESSING_DIRECTORY).exists()
+    assert (project / PROJECT_MANIFEST).read_text(encoding="utf-8") == manifest
+
+
+def test_remote_template_is_merged_from_local_clone(project: Path, template: Path):
+    manifest_file = project / PROJECT_MANIFEST
+    manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+    manifest["template"] = "gh:GispoCoding/cookiecutter-qgis-plugin"
+    manifest_file.write_text(json.dumps(manifest), encoding="utf-8")
+    _edit(template / "{{cookiecutter.project_directory}}" / "CHANGELOG.md", "# CHANGELOG\n", "# Changelog\n")
+    _commit_template(template)
+    changelog = project / "CHANGELOG.md"
+    changelog.write_text(changelog.read_text(encoding="utf-8") + "Edited in the project\n", encoding="utf-8")
+
+    result = update(project, template)
+
+    assert result.merged == ["CHANGELOG.md"]
+    merged = changelog.read_text(encoding="utf-8")
+    assert merged.startswith("# Changelog\n")
+    assert merged.endswith("Edited in the project\n")
@@ -1,12 +1,35 @@
-from pathlib import Path
+from __future__ import annotations
 
-from pytest_cookies.plugin import Result
+import subprocess
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from pathlib import Path
 
-def processing_directory_exitst(baked_project: Result, project_path: Path) -> bool:
+    from tests.bake_matrix import BakedProject
+
+
+def processing_directory_exitst(baked_project: BakedProject, project_path: Path) -> bool:
     """Returns True if the processing directory exists."""
     return (
         project_path
         / str(baked_project.context["plugin_package"])
         / f"{baked_project.context['plugin_package']}_processing"
     ).is_dir()
+
+
+def run_git(args: list[str], cwd: Path) -> str:
+    """Runs a git command with a fixed identity and returns its output."""
+    return subprocess.check_output(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        universal_newlines=True,
+    ).strip()
+
+
+def commit_file(repository: Path, name: str, content: str) -> str:
+    """Commits a file to the repository and returns the commit hash."""
+    (repository / name).write_text(content, encoding="utf-8")
+    run_git(["add", name], repository)
+    run_git(["commit", "--quiet", "-m", f"Add {name}"], repository)
+    return run_git(["rev-parse", "HEAD"], repository)
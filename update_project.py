@@ -0,0 +1,261 @@
+"""
+Updates a project generated from this template to the current template.
+
+The post-generation hook stores the context, the template commit and the
+hashes of the generated files to .cookiecutter-qgis-plugin.json in the
+project. This script renders the template again with the stored context,
+without creating a git repository or adding the qgis_plugin_tools
+submodule, and compares the result to the stored hashes:
+
+- Files whose rendered content has not changed are not touched.
+- Changed files which have not been edited in the project are replaced.
+- Changed files which have been edited in the project are merged with
+  git merge-file, using the files rendered from the stored template commit
+  as the base. The commit is taken from the git repository of the template
+  used for the update, so the template must be a clone which contains it.
+  The old template is rendered only if there is something to merge.
+  Conflicts are left in the files with conflict markers.
+- New files are added, and files removed from the template are removed
+  if they have not been edited.
+
+Usage:
+    python update_project.py [--template TEMPLATE] [--dry-run] PROJECT [OPTION=VALUE ...]
+
+The options override the stored context, for example include_processing=True.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from cookiecutter.main import cookiecutter
+
+PROJECT_MANIFEST = ".cookiecutter-qgis-plugin.json"
+RENDER_ONLY_VARIABLE = "POST_GEN_RENDER_ONLY"
+
+TEMPLATE_DIR = Path(__file__).parent
+
+
+class UpdateError(Exception):
+    pass
+
+
+class MissingManifestError(UpdateError):
+    def __init__(self, project: Path) -> None:
+        super().__init__(f"{project} has no {PROJECT_MANIFEST}, it was not generated with an updatable template.")
+
+
+@dataclass
+class UpdateResult:
+    updated: list[str] = field(default_factory=list)
+    added: list[str] = field(default_factory=list)
+    merged: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # Files which the template changed or removed, but which were removed or edited in the project
+    skipped: list[str] = field(default_factory=list)
+
+    def report(self) -> str:
+        return "\n".join(
+            f"{action} {path}"
+            for action, paths in (
+                ("update", self.updated),
+                ("add", self.added),
+                ("merge", self.merged),
+                ("conflict", self.conflicts),
+                ("remove", self.removed),
+                ("skip", self.skipped),
+            )
+            for path in paths
+        )
+
+
+def _hash(path: Path) -> str | None:
+    return hashlib.sha256(path.read_bytes()).hexdigest() if path.is_file() else None
+
+
+def _read_manifest(project: Path) -> dict[str, Any]:
+    manifest = project / PROJECT_MANIFEST
+    if not manifest.is_file():
+        raise MissingManifestError(project)
+    return json.loads(manifest.read_text(encoding="utf-8"))
+
+
+def render(template: Path, context: dict[str, Any], output_dir: Path) -> Path:
+    """Renders the template to the output directory and returns the path of the rendered project."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    config_file = output_dir / "config.yaml"
+    config_file.write_text(f"replay_dir: {output_dir / 'replay'}\n", encoding="utf-8")
+    render_only = os.environ.get(RENDER_ONLY_VARIABLE)
+    os.environ[RENDER_ONLY_VARIABLE] = "1"
+    try:
+        return Path(
+            cookiecutter(
+                str(template),
+                no_input=True,
+                extra_context=context,
+                output_dir=str(output_dir / "output"),
+                config_file=str(config_file),
+            )
+        )
+    finally:
+        if render_only is None:
+            del os.environ[RENDER_ONLY_VARIABLE]
+        else:
+            os.environ[RENDER_ONLY_VARIABLE] = render_only
+
+
+def _extract(archive_file: Path, destination: Path) -> None:
+    with tarfile.open(archive_file) as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(destination, filter="data")
+            return
+        # Python versions without extraction filters
+        for member in tar.getmembers():
+            member_path = (destination / member.name).resolve()
+            if not (member.isfile() or member.isdir()) or destination.resolve() not in member_path.parents:
+                message = f"Unexpected member {member.name} in the template archive"
+                raise UpdateError(message)
+        tar.extractall(destination)
+
+
+def render_commit(template: Path, commit: str | None, context: dict[str, Any], output_dir: Path) -> Path | None:
+    """
+    Renders the template at the commit, or returns None if the commit is not available.
+
+    The template must be a local git repository. The template recorded in the
+    project manifest can not be used, since it is what the user gave to
+    cookiecutter, for example gh:GispoCoding/cookiecutter-qgis-plugin.
+    """
+    if commit is None:
+        return None
+    archive = subprocess.run(
+        ["git", "-C", str(template), "archive", "--format=tar", f"{commit}:./"],  # noqa: S607
+        capture_output=True,
+        check=False,
+    )
+    if archive.returncode != 0:
+        return None
+    source = output_dir / "template"
+    source.mkdir(parents=True)
+    archive_file = output_dir / "template.tar"
+    archive_file.write_bytes(archive.stdout)
+    _extract(archive_file, source)
+    return render(source, context, output_dir)
+
+
+def merge(current: Path, base: Path | None, new: Path) -> bool:
+    """Merges the changes from base to new into current and returns False if there are conflicts."""
+    with tempfile.TemporaryDirectory() as directory:
+        if base is None or not base.is_file():
+            # Without a base every difference is a conflict
+            base = Path(directory) / "empty"
+            base.touch()
+        labels = ["-L", "project", "-L", "previous template", "-L", "template"]
+        result = subprocess.run(
+            ["git", "merge-file", *labels, str(current), str(base), str(new)],  # noqa: S607
+            capture_output=True,
+            check=False,
+        )
+    if result.returncode < 0:
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+    return result.returncode == 0
+
+
+def update(
+    project: Path, template: Path = TEMPLATE_DIR, overrides: dict[str, Any] | None = None, *, dry_run: bool = False
+) -> UpdateResult:
+    """Updates the project from the template and returns what was done."""
+    manifest = _read_manifest(project)
+    old_hashes: dict[str, str] = manifest["files"]
+    context = {**manifest["context"], **(overrides or {})}
+    result = UpdateResult()
+
+    with tempfile.TemporaryDirectory() as directory:
+        rendered = render(template, context, Path(directory) / "new")
+        new_manifest = _read_manifest(rendered)
+        new_hashes: dict[str, str] = new_manifest["files"]
+        # The project rendered from the template it was generated from, which is rendered when it is first needed
+        base: Path | None = None
+        base_rendered = False
+
+        for path in sorted({*old_hashes, *new_hashes}):
+            old_hash, new_hash = old_hashes.get(path), new_hashes.get(path)
+            target = project / path
+            current_hash = _hash(target)
+            if new_hash in (old_hash, current_hash):
+                continue
+
+            if new_hash is None:
+                if current_hash == old_hash:
+                    result.removed.append(path)
+                    if not dry_run:
+                        target.unlink()
+                else:
+                    result.skipped.append(path)
+            elif current_hash is None:
+                if old_hash is None:
+                    result.added.append(path)
+                    if not dry_run:
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        shutil.copy2(rendered / path, target)
+                else:
+                    result.skipped.append(path)
+            elif current_hash == old_hash:
+                result.updated.append(path)
+                if not dry_run:
+                    target.write_bytes((rendered / path).read_bytes())
+            else:
+                if not base_rendered and not dry_run:
+                    base = render_commit(template, manifest["commit"], manifest["context"], Path(directory) / "base")
+                    base_rendered = True
+                clean = dry_run or merge(target, base / path if base else None, rendered / path)
+                (result.merged if clean else result.conflicts).append(path)
+
+        if not dry_run:
+            (project / PROJECT_MANIFEST).write_bytes((rendered / PROJECT_MANIFEST).read_bytes())
+    return result
+
+
+def _parse_option(option: str) -> tuple[str, Any]:
+    name, separator, value = option.partition("=")
+    if not separator:
+        message = f"{option} is not of the form OPTION=VALUE"
+        raise argparse.ArgumentTypeError(message)
+    if value in ("True", "False"):
+        return name, value == "True"
+    return name, value
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(), formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("project", type=Path, help="the project to update")
+    parser.add_argument("options", nargs="*", type=_parse_option, help="options to change, as OPTION=VALUE")
+    parser.add_argument("--template", type=Path, default=TEMPLATE_DIR, help="the template, by default this one")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be done")
+    args = parser.parse_args(argv)
+
+    try:
+        result = update(args.project, args.template, dict(args.options), dry_run=args.dry_run)
+    except UpdateError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    print(result.report() or "The project is up to date.")
+    return 1 if result.conflicts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,20 +11,30 @@ Originated from https://github.com/GispoCoding/qgis-venv-creator
 
 Usage:
 python create_qgis_venv.py [--help] [--venv-parent <path-to-venv-parent-directory>] [--venv-name <venv-name>]
+    [--requirements <requirements-file> [--wheelhouse [<wheelhouse-directory>]]] [--clone-golden-venv]
+    [--all-installations [--manifest <json-file>]]
 """
 
 from __future__ import annotations
 
 import argparse
+import fnmatch
+import hashlib
+import json
 import logging
 import os
 import platform
+import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Generator, Protocol, TypedDict, cast
+from typing import TYPE_CHECKING, Any, ClassVar, Protocol, TypedDict, cast
 
 if TYPE_CHECKING:
 
@@ -34,8 +44,21 @@ if TYPE_CHECKING:
         venv_parent: Path | None
         venv_name: str | None
         python_executable: Path | None
+        requirements: Path | None
+        clone_golden_venv: bool
+        wheelhouse: Path | None
+        all_installations: bool
+        manifest: Path | None
+        jobs: int | None
         debug: bool
 
+    class VenvMatrixEntry(TypedDict):
+        qgis_installation: str
+        python_executable: str | None
+        venv: str | None
+        error: str | None
+        seconds: float
+
     class SupportsVenvCreation(Protocol):
         @classmethod
         def create_venv(cls, *args: Any, **kwargs: Any) -> Path: ...
@@ -43,11 +66,22 @@ if TYPE_CHECKING:
         @staticmethod
         def cli_arguments() -> list[CliArg]: ...
 
+        @classmethod
+        def create_venv_matrix(cls, *args: Any, **kwargs: Any) -> list[VenvMatrixEntry]: ...
+
 
 __version__ = "0.1.0"
 
 cli_args: CliArgsType = {}
 
+# The golden virtual environments and wheelhouses being created, so that each is created only once at the same time
+_locks: dict[Path, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+QGIS_INSTALLATION_CACHE_VERSION = 1
+GOLDEN_VENV_CACHE_VERSION = 1
+WHEELHOUSE_BUILD_WORKERS = 4
+
 
 class CliArg:
     """Command line argument definition to be passed to argparse.ArgumentParser.add_argument()
@@ -88,6 +122,11 @@ class InvalidQgisPathError(RuntimeError):
         super().__init__(f"{qgis_installation} is not a valid QGIS path.")
 
 
+class VenvDirectoryExistsError(RuntimeError):
+    def __init__(self, venv_directory: Path):
+        super().__init__(f"{venv_directory} already exists.")
+
+
 class VenvParentDirectoryNotExistsError(RuntimeError):
     def __init__(self, venv_directory: Path):
         super().__init__(f"Virtual environment directory {venv_directory} does not exist.")
@@ -109,19 +148,13 @@ def _is_valid_python_executable(python_executable: Path | None) -> bool:
     return python_executable is not None and python_executable.exists() and os.access(python_executable, os.X_OK)
 
 
-def _create_venv(python_executable: Path | None, venv_parent: Path | None = None, venv_name: str | None = None) -> Path:
-    """Create a virtual environment for a QGIS plugin project."""
-
-    if python_executable is None or not python_executable.exists() or not os.access(python_executable, os.X_OK):
-        raise InvalidPythonExecutableError(python_executable)
-
-    venv_parent = venv_parent or Path.cwd()
-    if not venv_parent.exists():
-        raise VenvParentDirectoryNotExistsError(venv_parent)
+def _venv_python_executable(venv_directory: Path) -> Path:
+    if platform.system() == "Windows":
+        return venv_directory / "Scripts" / "python.exe"
+    return venv_directory / "bin" / "python"
 
-    venv_name = venv_name or ".venv"
 
-    venv_directory = venv_parent / venv_name
+def _run_venv_module(python_executable: Path, venv_directory: Path) -> None:
     logger.debug("Creating virtual environment to '%s' using '%s'", venv_directory, python_executable)
     try:
         subprocess.run(
@@ -138,17 +171,289 @@ def _create_venv(python_executable: Path | None, venv_parent: Path | None = None
         logger.debug("Failed to create virtual environment. %s", e)
         raise VenvCreationError from e
 
+
+def _lock(path: Path) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _run_pip(python_executable: Path, *args: str | Path) -> None:
+    try:
+        subprocess.run([python_executable, "-m", "pip", *args], check=True)
+    except subprocess.CalledProcessError as e:
+        logger.debug("Failed to run pip. %s", e)
+        raise VenvCreationError from e
+
+
+def _interpreter_tag(python_executable: Path) -> str:
+    """Returns the implementation, version and platform of the Python executable, for example cpython-39-win-amd64."""
+
+    try:
+        output = subprocess.run(
+            [
+                python_executable,
+                "-c",
+                "import sys, sysconfig; print(sys.implementation.cache_tag, sysconfig.get_platform())",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    except subprocess.CalledProcessError as e:
+        logger.debug("Failed to run '%s'. %s", python_executable, e)
+        raise VenvCreationError from e
+    return re.sub(r"[^a-z0-9]+", "-", output.strip().lower())
+
+
+def _requirement_specifiers(requirements: Path) -> list[str]:
+    """Returns the requirements listed in the requirements file, without options, hashes and comments."""
+
+    content = requirements.read_text(encoding="utf-8").replace("\\\n", " ")
+    specifiers: list[str] = []
+    for line in content.splitlines():
+        specifier = re.sub(r"(^|\s)#.*", "", line)
+        specifier = re.sub(r"\s--hash[=\s]\S+", "", specifier).strip()
+        if specifier and not specifier.startswith("-"):
+            specifiers.append(specifier)
+    return specifiers
+
+
+def _build_wheelhouse(python_executable: Path, requirements: Path, wheel_directory: Path) -> None:
+    """Build the wheels of the requirements and their dependencies to the directory.
+
+    The wheels of the listed requirements are built at the same time first. A compiled requirements file
+    lists every dependency, so the wheelhouse is then only checked to be complete without network access.
+    The dependencies which are not listed are built with one more pip run, which reuses the built wheels.
+    """
+
+    specifiers = _requirement_specifiers(requirements)
+    workers = max(1, min(WHEELHOUSE_BUILD_WORKERS, len(specifiers)))
+    chunks = [chunk for chunk in (specifiers[index::workers] for index in range(workers)) if chunk]
+    logger.debug("Building wheels of '%s' to '%s'", requirements, wheel_directory)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_run_pip, python_executable, "wheel", "--no-deps", "--wheel-dir", wheel_directory, *chunk)
+            for chunk in chunks
+        ]
+    for future in futures:
+        future.result()
+
+    wheel_arguments = ["--wheel-dir", wheel_directory, "--find-links", wheel_directory, "-r", requirements]
+    offline = subprocess.run(
+        [python_executable, "-m", "pip", "wheel", "--no-index", *wheel_arguments], check=False, capture_output=True
+    )
+    if offline.returncode != 0:
+        logger.debug("Building the dependencies not listed in '%s'", requirements)
+        _run_pip(python_executable, "wheel", *wheel_arguments)
+
+
+def _compile_requirements(python_executable: Path, requirements: Path) -> None:
+    """Compile an empty requirements file from the .in file next to it, for example requirements-dev.in.
+
+    The requirements are compiled with pip-tools run by the Python executable, so that the pins are
+    resolved for the Python of QGIS. pip-tools is installed to a temporary virtual environment.
+    """
+
+    source = requirements.with_suffix(".in")
+    with _lock(requirements):
+        if not source.exists() or (requirements.exists() and requirements.read_text(encoding="utf-8").strip()):
+            return
+        logger.debug("Compiling '%s' from '%s'", requirements, source)
+        with tempfile.TemporaryDirectory() as directory:
+            tools_venv = Path(directory) / "pip-tools"
+            _run_venv_module(python_executable, tools_venv)
+            tools_python = _venv_python_executable(tools_venv)
+            _run_pip(tools_python, "install", "pip-tools")
+            try:
+                subprocess.run(
+                    [tools_python, "-m", "piptools", "compile", "--quiet", "--output-file", requirements, source],
+                    check=True,
+                )
+            except subprocess.CalledProcessError as e:
+                logger.debug("Failed to compile '%s'. %s", source, e)
+                raise VenvCreationError from e
+
+
+def _install_requirements(venv_directory: Path, requirements: Path, wheelhouse: Path | None = None) -> None:
+    """Install the requirements to the virtual environment.
+
+    With a wheelhouse, the requirements are installed without network access from the wheels built
+    to the wheelhouse for the hash of the requirements file and the interpreter. The wheels are built
+    on the first use, which requires network access.
+    """
+
+    python_executable = _venv_python_executable(venv_directory)
+    logger.debug("Installing '%s' to '%s'", requirements, venv_directory)
+    if wheelhouse is None:
+        _run_pip(python_executable, "install", "-r", requirements)
+        return
+
+    wheelhouse_directory = wheelhouse / hashlib.sha256(requirements.read_bytes()).hexdigest()[:16]
+    wheel_directory = wheelhouse_directory / "wheels"
+    # Written when the wheels for the interpreter are built
+    info_file = wheelhouse_directory / f"{_interpreter_tag(python_executable)}.json"
+    with _lock(info_file):
+        if not info_file.exists():
+            wheel_directory.mkdir(parents=True, exist_ok=True)
+            _build_wheelhouse(python_executable, requirements, wheel_directory)
+            info_file.write_text(json.dumps({"requirements": str(requirements)}, indent=2), encoding="utf-8")
+    _run_pip(python_executable, "install", "--no-index", "--find-links", wheel_directory, "-r", requirements)
+
+
+def _golden_venv_directory(python_executable: Path, requirements: Path | None) -> Path:
+    """Returns the directory of the golden virtual environment of the Python executable and the requirements."""
+
+    resolved_python_executable = python_executable.resolve()
+    status = resolved_python_executable.stat()
+    digest = hashlib.sha256()
+    for part in (GOLDEN_VENV_CACHE_VERSION, resolved_python_executable, status.st_size, status.st_mtime_ns):
+        digest.update(f"{part}\0".encode())
+    if requirements is not None:
+        digest.update(requirements.read_bytes())
+    return _user_cache_directory() / "golden-venvs" / f"venv-{digest.hexdigest()[:16]}"
+
+
+def _golden_venv(python_executable: Path, requirements: Path | None, wheelhouse: Path | None) -> Path:
+    """Returns the golden virtual environment with the requirements installed, creating it on the first use."""
+
+    golden_venv_directory = _golden_venv_directory(python_executable, requirements)
+    with _lock(golden_venv_directory):
+        # Written when the golden virtual environment is complete, outside of it so that it is not cloned
+        info_file = golden_venv_directory.with_suffix(".json")
+        if info_file.exists():
+            logger.debug("Using golden virtual environment '%s'", golden_venv_directory)
+            return golden_venv_directory
+
+        shutil.rmtree(golden_venv_directory, ignore_errors=True)
+        golden_venv_directory.parent.mkdir(parents=True, exist_ok=True)
+        _run_venv_module(python_executable, golden_venv_directory)
+        if requirements is not None:
+            _install_requirements(golden_venv_directory, requirements, wheelhouse)
+        info = {"python_executable": str(python_executable), "requirements": requirements and str(requirements)}
+        info_file.write_text(json.dumps(info, indent=2), encoding="utf-8")
+        return golden_venv_directory
+
+
+def _link_or_copy(source: Path, destination: Path) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _copy_with_replacements(source: Path, destination: Path, replacements: tuple[tuple[bytes, bytes], ...]) -> bool:
+    """Copy the file with the replacements made, if any of them is found. Returns whether the file was copied."""
+
+    content = source.read_bytes()
+    replaced_content = content
+    for old, new in replacements:
+        replaced_content = replaced_content.replace(old, new)
+    if replaced_content == content:
+        return False
+    destination.write_bytes(replaced_content)
+    shutil.copymode(source, destination)
+    return True
+
+
+def _clone_venv(source: Path, destination: Path) -> None:
+    """Clone the virtual environment with hard links, or copies where the file system does not support them.
+
+    The files referring to the source directory, such as pyvenv.cfg, the activation scripts and
+    the entry point scripts, are copied with the references changed to the destination. The
+    bytecode caches, which also refer to the source directory, are written again on import.
+    """
+
+    if destination.exists():
+        raise VenvDirectoryExistsError(destination)
+    source = source.absolute()
+    destination = destination.absolute()
+    logger.debug("Cloning virtual environment '%s' to '%s'", source, destination)
+    replacements = (
+        (os.fsencode(source), os.fsencode(destination)),
+        (f"({source.name})".encode(), f"({destination.name})".encode()),
+    )
+    for directory, directory_names, file_names in os.walk(source):
+        source_directory = Path(directory)
+        target_directory = destination / source_directory.relative_to(source)
+        target_directory.mkdir(parents=True)
+        has_references = source_directory == source or (
+            source_directory.parent == source and source_directory.name in ("bin", "Scripts")
+        )
+        for name in list(directory_names):
+            path = source_directory / name
+            if path.is_symlink():
+                os.symlink(os.readlink(path), target_directory / name)
+            if name == "__pycache__" or path.is_symlink():
+                directory_names.remove(name)
+        for name in file_names:
+            path = source_directory / name
+            target = target_directory / name
+            if path.is_symlink():
+                os.symlink(os.readlink(path), target)
+            elif not has_references or not _copy_with_replacements(path, target, replacements):
+                _link_or_copy(path, target)
+
+
+def _create_venv(
+    python_executable: Path | None,
+    venv_parent: Path | None = None,
+    venv_name: str | None = None,
+    *,
+    requirements: Path | None = None,
+    clone_golden_venv: bool = False,
+    wheelhouse: Path | None = None,
+) -> Path:
+    """Create a virtual environment for a QGIS plugin project.
+
+    With clone_golden_venv, the virtual environment is cloned from a golden virtual environment
+    of the Python executable and the requirements, which is created on the first use.
+    """
+
+    if python_executable is None or not python_executable.exists() or not os.access(python_executable, os.X_OK):
+        raise InvalidPythonExecutableError(python_executable)
+
+    venv_parent = venv_parent or Path.cwd()
+    if not venv_parent.exists():
+        raise VenvParentDirectoryNotExistsError(venv_parent)
+
+    venv_name = venv_name or ".venv"
+
+    venv_directory = venv_parent / venv_name
+    if requirements is not None:
+        _compile_requirements(python_executable, requirements)
+    if clone_golden_venv:
+        _clone_venv(_golden_venv(python_executable, requirements, wheelhouse), venv_directory)
+        return venv_directory
+
+    _run_venv_module(python_executable, venv_directory)
+    if requirements is not None:
+        _install_requirements(venv_directory, requirements, wheelhouse)
+
     return venv_directory
 
 
-def _create_glob_generator_from_pattern(pattern: str) -> Generator[Path, None, None]:
-    """Create a glob generator from a pattern.
+def _venv_name_suffixes(qgis_installations: list[Path]) -> dict[Path, str]:
+    """Name the installations by as many of the last parts of their paths as needed to tell them apart."""
+
+    names: dict[Path, str] = {}
+    for depth in range(1, max((len(path.parts) for path in qgis_installations), default=0) + 1):
+        names = {
+            path: re.sub(r"[^a-z0-9._]+", "-", "-".join(path.parts[-depth:]).lower()).strip("-")
+            for path in qgis_installations
+        }
+        if len(set(names.values())) == len(names):
+            return names
+    return {path: f"{name}-{index}" for index, (path, name) in enumerate(names.items(), start=1)}
 
-    The Path.glob() method does not support absolute paths. This is to overcome that limitation.
+
+def _split_glob_pattern(pattern: str) -> tuple[Path, list[str]]:
+    """Split a glob pattern to the directory before the first wildcard and the remaining parts.
+
+    The Path.glob() method does not support absolute paths, so the search starts from the directory.
     """
 
     glob_parts: list[str] = []
-    part_iterator = iter(Path(pattern).parts)
+    part_iterator = iter(Path(os.path.expanduser(pattern)).parts)
     root_part = next(part_iterator)
     if "*" in root_part:
         raise GlobPatternError(pattern)
@@ -159,7 +464,118 @@ def _create_glob_generator_from_pattern(pattern: str) -> Generator[Path, None, N
         else:
             glob_parts.append(part)
 
-    return path.glob(os.sep.join(glob_parts))
+    return path, glob_parts
+
+
+def _modification_time(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _glob_directories(pattern: str, read_directories: dict[str, int | None]) -> list[Path]:
+    """Find the directories matching the glob pattern.
+
+    The modification times of the directories read are added to read_directories, so that
+    a changed search result can be detected without repeating the search.
+    """
+
+    base_directory, glob_parts = _split_glob_pattern(pattern)
+    read_directories[str(base_directory)] = _modification_time(base_directory)
+    directories = [base_directory]
+    for part in glob_parts:
+        matches: list[Path] = []
+        for directory in directories:
+            read_directories[str(directory)] = _modification_time(directory)
+            if "*" not in part:
+                if (directory / part).is_dir():
+                    matches.append(directory / part)
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    matches.extend(
+                        Path(entry.path) for entry in entries if fnmatch.fnmatch(entry.name, part) and entry.is_dir()
+                    )
+            except OSError:
+                continue
+        directories = sorted(matches)
+
+    return [directory for directory in directories if directory.is_dir()]
+
+
+def _user_cache_directory() -> Path:
+    """Returns the directory for the cache files, which can be set with QGIS_VENV_CREATOR_CACHE_DIR."""
+
+    cache_directory = os.environ.get("QGIS_VENV_CREATOR_CACHE_DIR")
+    if cache_directory:
+        return Path(cache_directory)
+    if platform.system() == "Windows":
+        return Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "qgis-venv-creator"
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "qgis-venv-creator"
+
+
+class QgisInstallationCache:
+    """Persistent cache of the QGIS installations and their Python executables found with each search pattern.
+
+    The search results of a pattern are used until the modification time of a directory read during the
+    search changes, which happens when an installation is added to or removed from the directory.
+    """
+
+    def __init__(self, path: Path, entries: dict[str, Any] | None = None):
+        self.path = path
+        self._entries: dict[str, Any] = entries or {}
+        self._changed = False
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> QgisInstallationCache:
+        path = path or _user_cache_directory() / "qgis_installations.json"
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(content, dict) or content.get("version") != QGIS_INSTALLATION_CACHE_VERSION:
+            return cls(path)
+        return cls(path, content["patterns"])
+
+    def get(self, pattern: str) -> dict[Path, Path] | None:
+        """Returns the installations found with the pattern, or None if the search has to be repeated."""
+
+        entry = self._entries.get(pattern)
+        if entry is None:
+            return None
+        for directory, modification_time in entry["directories"].items():
+            if _modification_time(Path(directory)) != modification_time:
+                logger.debug("Search results of '%s' are outdated, '%s' has changed", pattern, directory)
+                return None
+        return {Path(installation): Path(python) for installation, python in entry["installations"].items()}
+
+    def store(self, pattern: str, installations: dict[Path, Path], read_directories: dict[str, int | None]) -> None:
+        self._entries[pattern] = {
+            "directories": read_directories,
+            "installations": {str(installation): str(python) for installation, python in installations.items()},
+        }
+        self._changed = True
+
+    def python_executable(self, qgis_installation: Path) -> Path | None:
+        for entry in self._entries.values():
+            python_executable = entry["installations"].get(str(qgis_installation))
+            if python_executable is not None:
+                return Path(python_executable)
+        return None
+
+    def save(self) -> None:
+        if not self._changed:
+            return
+        content = json.dumps({"version": QGIS_INSTALLATION_CACHE_VERSION, "patterns": self._entries}, indent=2)
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path.write_text(content, encoding="utf-8")
+            temporary_path.replace(self.path)
+        except OSError as e:
+            logger.debug("Failed to write the QGIS installation cache. %s", e)
+        self._changed = False
 
 
 class Platform(ABC):
@@ -176,11 +592,7 @@ class Platform(ABC):
 
 
 class MultiQgisPlatform(Platform):
-    @staticmethod
-    @abstractmethod
-    def _find_qgis_installations(qgis_installation_search_path_pattern: str | None = None) -> list[Path]:
-        """Find all QGIS installations from the system."""
-        raise NotImplementedError
+    QGIS_INSTALLATION_SEARCH_PATH_PATTERNS: ClassVar[tuple[str, ...]] = ()
 
     @staticmethod
     @abstractmethod
@@ -194,6 +606,12 @@ class MultiQgisPlatform(Platform):
         """Find the Python executable for the QGIS installation."""
         raise NotImplementedError
 
+    @staticmethod
+    def _installation_directories(qgis_installation: Path) -> tuple[Path, ...]:
+        """Directories whose contents decide whether the QGIS installation is valid."""
+
+        return (qgis_installation,)
+
     @classmethod
     @abstractmethod
     def create_venv(
@@ -203,9 +621,120 @@ class MultiQgisPlatform(Platform):
         venv_parent: Path,
         venv_name: str,
         qgis_installation_search_path_pattern: str | None = None,
+        *,
+        requirements: Path | None = None,
+        clone_golden_venv: bool = False,
+        wheelhouse: Path | None = None,
     ) -> Path:
         raise NotImplementedError
 
+    @classmethod
+    def _search_qgis_installations(cls, pattern: str) -> tuple[dict[Path, Path], dict[str, int | None]]:
+        """Find the valid QGIS installations matching the pattern and their Python executables.
+
+        Returns also the modification times of the directories the result depends on.
+        """
+
+        read_directories: dict[str, int | None] = {}
+        installations: dict[Path, Path] = {}
+        for candidate in _glob_directories(pattern, read_directories):
+            for directory in cls._installation_directories(candidate):
+                read_directories[str(directory)] = _modification_time(directory)
+            python_executable = cls._find_qgis_python_executable(candidate)
+            if python_executable is not None and cls._is_valid_qgis_path(candidate):
+                installations[candidate] = python_executable
+        return installations, read_directories
+
+    @classmethod
+    def _find_qgis_installations(cls, custom_search_path_pattern: str | None = None) -> list[Path]:
+        """Find all QGIS installations from the system.
+
+        The installations found with each pattern are cached, see QgisInstallationCache.
+        """
+
+        patterns = list(cls.QGIS_INSTALLATION_SEARCH_PATH_PATTERNS)
+        if custom_search_path_pattern is not None:
+            patterns.append(custom_search_path_pattern)
+
+        cache = QgisInstallationCache.load()
+        qgis_installations: list[Path] = []
+        for pattern in patterns:
+            cache_key = f"{cls.__name__}:{os.path.expanduser(pattern)}"
+            installations = cache.get(cache_key)
+            if installations is None:
+                installations, read_directories = cls._search_qgis_installations(pattern)
+                cache.store(cache_key, installations, read_directories)
+            qgis_installations.extend(
+                installation for installation in installations if installation not in qgis_installations
+            )
+        cache.save()
+        return qgis_installations
+
+    @classmethod
+    def _qgis_python_executable(cls, qgis_installation: Path) -> Path | None:
+        """Find the Python executable for the QGIS installation, from the cache if the installation was found before."""
+
+        python_executable = QgisInstallationCache.load().python_executable(qgis_installation)
+        return python_executable or cls._find_qgis_python_executable(qgis_installation)
+
+    @classmethod
+    def create_venv_matrix(
+        cls,
+        venv_parent: Path,
+        venv_name: str,
+        qgis_installation_search_path_pattern: str | None = None,
+        *,
+        requirements: Path | None = None,
+        clone_golden_venv: bool = False,
+        wheelhouse: Path | None = None,
+        max_workers: int | None = None,
+    ) -> list[VenvMatrixEntry]:
+        """Create a virtual environment for each QGIS installation found from the system at the same time.
+
+        The virtual environments are named after the venv_name and the installation, for example .venv-qgis-ltr.
+        """
+
+        search_path_pattern = qgis_installation_search_path_pattern or os.environ.get(
+            "QGIS_INSTALLATION_SEARCH_PATH_PATTERN"
+        )
+        qgis_installations = cls._find_qgis_installations(search_path_pattern)
+        venv_name_suffixes = _venv_name_suffixes(qgis_installations)
+
+        def create(qgis_installation: Path) -> VenvMatrixEntry:
+            started = time.perf_counter()
+            python_executable = cls._qgis_python_executable(qgis_installation)
+            entry: VenvMatrixEntry = {
+                "qgis_installation": str(qgis_installation),
+                "python_executable": python_executable and str(python_executable),
+                "venv": None,
+                "error": None,
+                "seconds": 0.0,
+            }
+            try:
+                venv_directory = cls.create_venv(
+                    python_executable,
+                    qgis_installation,
+                    venv_parent,
+                    f"{venv_name}-{venv_name_suffixes[qgis_installation]}",
+                    requirements=requirements,
+                    clone_golden_venv=clone_golden_venv,
+                    wheelhouse=wheelhouse,
+                )
+            except (
+                VenvCreationError,
+                InvalidPythonExecutableError,
+                InvalidQgisPathError,
+                VenvDirectoryExistsError,
+            ) as e:
+                entry["error"] = str(e)
+            else:
+                entry["venv"] = str(venv_directory)
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+            return entry
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(create, qgis_installations))
+
     @classmethod
     def select_qgis_install(cls, custom_search_path_pattern: str | None = None) -> Path:
         """Prompts the user to select a QGIS installation from the system."""
@@ -275,31 +804,16 @@ class MultiQgisPlatform(Platform):
 
 
 class Windows(MultiQgisPlatform):
-    @classmethod
-    def _find_qgis_installations(cls, custom_search_path_pattern: str | None = None) -> list[Path]:
-        """Find all QGIS installations from the Windows system."""
-
-        possible_qgis_installation_generators = [
-            Path("C:/Program Files").glob("QGIS*/apps/qgis*/"),
-            Path("C:/OSGeo4W/apps").glob("qgis*/"),
-            Path("C:/OSGeo4W64/apps").glob("qgis*/"),
-        ]
-
-        if custom_search_path_pattern is not None:
-            if not custom_search_path_pattern.endswith(os.sep) or (
-                os.altsep is not None and not custom_search_path_pattern.endswith(os.altsep)
-            ):
-                custom_search_path_pattern += os.sep
-            possible_qgis_installation_generators.append(
-                _create_glob_generator_from_pattern(custom_search_path_pattern)
-            )
+    QGIS_INSTALLATION_SEARCH_PATH_PATTERNS = (
+        "C:/Program Files/QGIS*/apps/qgis*/",
+        "C:/OSGeo4W/apps/qgis*/",
+        "C:/OSGeo4W64/apps/qgis*/",
+    )
 
-        return [
-            qgis_installation
-            for possible_qgis_installation_glob in possible_qgis_installation_generators
-            for qgis_installation in possible_qgis_installation_glob
-            if cls._is_valid_qgis_path(qgis_installation)
-        ]
+    @staticmethod
+    def _installation_directories(qgis_installation: Path) -> tuple[Path, ...]:
+        apps_directory = qgis_installation.parent
+        return (qgis_installation, apps_directory, apps_directory.parent, apps_directory / "Qt5")
 
     @staticmethod
     def _is_valid_qgis_path(qgis_installation: Path) -> bool:
@@ -361,25 +875,85 @@ class Windows(MultiQgisPlatform):
         venv_parent: Path,
         venv_name: str,
         qgis_installation_search_path_pattern: str | None = None,
+        *,
+        requirements: Path | None = None,
+        clone_golden_venv: bool = False,
+        wheelhouse: Path | None = None,
     ) -> Path:
         qgis_installation = qgis_installation or cls.select_qgis_install(qgis_installation_search_path_pattern)
         if not cls._is_valid_qgis_path(qgis_installation):
             raise InvalidQgisPathError(qgis_installation)
-        python_executable = python_executable or cls._find_qgis_python_executable(qgis_installation)
+        python_executable = python_executable or cls._qgis_python_executable(qgis_installation)
         if not _is_valid_python_executable(python_executable):
             raise InvalidPythonExecutableError(python_executable)
-        venv_directory = _create_venv(python_executable, venv_parent, venv_name=venv_name)
+        venv_directory = _create_venv(
+            python_executable,
+            venv_parent,
+            venv_name=venv_name,
+            requirements=requirements,
+            clone_golden_venv=clone_golden_venv,
+            wheelhouse=wheelhouse,
+        )
 
         cls._patch_venv(venv_directory, qgis_installation)
 
         return venv_directory
 
 
-class Linux(Platform):
+class Linux(MultiQgisPlatform):
+    """QGIS installed to a prefix, such as /usr or a conda environment, with the qgis and python3 executables."""
+
+    QGIS_INSTALLATION_SEARCH_PATH_PATTERNS = (
+        "/usr/",
+        "/usr/local/",
+        "/opt/*/",
+        "~/miniconda3/envs/*/",
+        "~/miniforge3/envs/*/",
+        "~/anaconda3/envs/*/",
+    )
+
+    @staticmethod
+    def _installation_directories(qgis_installation: Path) -> tuple[Path, ...]:
+        return (qgis_installation, qgis_installation / "bin")
+
+    @staticmethod
+    def _is_valid_qgis_path(qgis_path: Path) -> bool:
+        python_path = Linux._find_qgis_python_executable(qgis_path)
+        return (qgis_path / "bin" / "qgis").exists() and _is_valid_python_executable(python_path)
+
+    @staticmethod
+    def _find_qgis_python_executable(qgis_install_directory: Path) -> Path | None:
+        python_path = qgis_install_directory / "bin" / "python3"
+        return python_path if python_path.exists() else None
+
     @classmethod
     def create_venv(
-        cls, python_executable: Path | None = None, venv_parent: Path | None = None, venv_name: str | None = None
+        cls,
+        python_executable: Path | None = None,
+        qgis_installation: Path | None = None,
+        venv_parent: Path | None = None,
+        venv_name: str | None = None,
+        qgis_installation_search_path_pattern: str | None = None,
+        *,
+        requirements: Path | None = None,
+        clone_golden_venv: bool = False,
+        wheelhouse: Path | None = None,
     ) -> Path:
+        if python_executable is None and qgis_installation is None:
+            search_path_pattern = qgis_installation_search_path_pattern or os.environ.get(
+                "QGIS_INSTALLATION_SEARCH_PATH_PATTERN"
+            )
+            qgis_installations = cls._find_qgis_installations(search_path_pattern)
+            if len(qgis_installations) > 1:
+                qgis_installation = cls.select_qgis_install(search_path_pattern)
+            elif qgis_installations:
+                qgis_installation = qgis_installations[0]
+
+        if qgis_installation is not None:
+            if not cls._is_valid_qgis_path(qgis_installation):
+                raise InvalidQgisPathError(qgis_installation)
+            python_executable = python_executable or cls._qgis_python_executable(qgis_installation)
+
         if python_executable is None:
             python3_command = Path("python3")
             python3_executable = shutil.which(python3_command)
@@ -387,7 +961,41 @@ class Linux(Platform):
                 raise InvalidPythonExecutableError(python3_command)
             python_executable = Path(python3_executable)
 
-        return _create_venv(python_executable, venv_parent, venv_name=venv_name)
+        return _create_venv(
+            python_executable,
+            venv_parent,
+            venv_name=venv_name,
+            requirements=requirements,
+            clone_golden_venv=clone_golden_venv,
+            wheelhouse=wheelhouse,
+        )
+
+    @staticmethod
+    def cli_arguments() -> list[CliArg]:
+        return [
+            CliArg(
+                "--qgis-installation",
+                help=(
+                    "Path to the prefix of the QGIS installation to use for development, for example /usr. "
+                    "If not given, the installation is searched and the user is prompted to select one "
+                    "if several are found. If none is found, python3 is used."
+                ),
+                type=Path,
+            ),
+            CliArg(
+                "--qgis-installation-search-path-pattern",
+                help=(
+                    "Custom glob pattern for QGIS installations to be selected. "
+                    "Can be set also with QGIS_INSTALLATION_SEARCH_PATH_PATTERN environment variable."
+                ),
+                type=str,
+            ),
+            CliArg(
+                "--python-executable",
+                help="Path to the Python executable. If not given, the python3 of the QGIS installation is used.",
+                type=Path,
+            ),
+        ]
 
 
 def cli() -> None:
@@ -413,26 +1021,106 @@ def cli() -> None:
         default=Path.cwd(),
     )
     parser.add_argument("--venv-name", help="Name of the virtual environment", default=".venv")
+    parser.add_argument(
+        "--requirements",
+        help=(
+            "Requirements file to install to the virtual environment, for example requirements-dev.txt. An empty "
+            "requirements file is first compiled from the .in file next to it with pip-tools."
+        ),
+        type=Path,
+    )
+    parser.add_argument(
+        "--clone-golden-venv",
+        action="store_true",
+        help=(
+            "Clone the virtual environment from a golden virtual environment of the Python executable and the "
+            "requirements. The golden virtual environment is created to the user cache directory on the first use."
+        ),
+    )
     for cli_arg in environment.cli_arguments():
         parser.add_argument(*cli_arg.args, **cli_arg.kwargs)
+    parser.add_argument(
+        "--wheelhouse",
+        nargs="?",
+        const=_user_cache_directory() / "wheelhouse",
+        help=(
+            "Install the requirements without network access from wheels built to this directory, by default "
+            "to the user cache directory, for the hash of the requirements file. The wheels are built on the "
+            "first use. Copy the directory to install the requirements on hosts without network access."
+        ),
+        type=Path,
+    )
+    parser.add_argument(
+        "--all-installations",
+        "--matrix",
+        action="store_true",
+        help=(
+            "Create a virtual environment for each QGIS installation found, named after --venv-name and the "
+            "installation, without prompting. The virtual environments are created at the same time."
+        ),
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Path to the JSON file of the virtual environments created with --all-installations.",
+        type=Path,
+    )
+    parser.add_argument(
+        "--jobs", help="Number of virtual environments created at the same time with --all-installations.", type=int
+    )
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
 
     args = cast("CliArgsType", vars(parser.parse_args()))
+    if args.get("wheelhouse") is not None and args.get("requirements") is None:
+        parser.error("--wheelhouse requires --requirements")
     cli_args.update(args)
 
     if args.pop("debug"):
         logging.basicConfig(level=logging.DEBUG)
 
+    all_installations = args.pop("all_installations")
+    manifest = args.pop("manifest")
+    jobs = args.pop("jobs")
+    if all_installations:
+        _create_venv_matrix(environment, args, manifest, jobs)
+        return
+
     try:
         environment.create_venv(**args)
     except VenvCreationError:
         print("Virtual environment creation failed", file=sys.stderr)
         sys.exit(1)
-    except (InvalidPythonExecutableError, InvalidQgisPathError) as e:
+    except (InvalidPythonExecutableError, InvalidQgisPathError, VenvDirectoryExistsError) as e:
         print(str(e), file=sys.stderr)
         sys.exit(1)
 
 
+def _create_venv_matrix(
+    environment: SupportsVenvCreation, args: CliArgsType, manifest: Path | None, jobs: int | None
+) -> None:
+    venv_parent = cast(Path, args["venv_parent"])
+    venv_name = cast(str, args["venv_name"])
+    entries = environment.create_venv_matrix(
+        venv_parent,
+        venv_name,
+        args.get("qgis_installation_search_path_pattern"),
+        requirements=args.get("requirements"),
+        clone_golden_venv=args.get("clone_golden_venv", False),
+        wheelhouse=args.get("wheelhouse"),
+        max_workers=jobs,
+    )
+
+    manifest = manifest or venv_parent / f"{venv_name}-matrix.json"
+    manifest.write_text(json.dumps({"venvs": entries}, indent=2), encoding="utf-8")
+    for entry in entries:
+        print(f"{entry['qgis_installation']}: {entry['venv'] or entry['error']}")
+    print(f"Wrote {manifest}")
+    if not entries:
+        print("No QGIS installations found", file=sys.stderr)
+        sys.exit(1)
+    if any(entry["error"] for entry in entries):
+        sys.exit(1)
+
+
 def main() -> None:
     try:
         cli()
@@ -0,0 +1,87 @@
+"""
+Fixtures for the processing tests and benchmarks.
+
+Benchmarks are tests marked with the benchmark marker that use the
+benchmark fixture. They are not run by default, run them with
+pytest -m benchmark. Their results are printed at the end of the test
+session. The size of the benchmark layers can be adjusted with the
+BENCHMARK_FEATURE_COUNT environment variable.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+
+from .layers import BENCHMARK_FEATURE_COUNT, create_point_layer
+
+if TYPE_CHECKING:
+    from _pytest.terminal import TerminalReporter
+    from qgis.core import QgsVectorLayer
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    seconds: float
+    rows: int
+    # The return value of the last round
+    value: Any = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float("inf")
+
+
+_benchmark_results: list[BenchmarkResult] = []
+
+
+def pytest_terminal_summary(terminalreporter: TerminalReporter) -> None:
+    if not _benchmark_results:
+        return
+    terminalreporter.section("benchmarks")
+    for result in _benchmark_results:
+        terminalreporter.write_line(
+            f"{result.name:<50} {result.seconds * 1000:10.1f} ms {result.rows_per_second:14.0f} rows/s"
+        )
+
+
+@pytest.fixture
+def benchmark() -> Callable[..., BenchmarkResult]:
+    """
+    Returns a function that times the best of the given rounds of a callable.
+
+    The return value of the last round is stored in the result, so that the
+    benchmark can check that the timed code did its job. If self_timed is
+    True, the callable returns a dict with the seconds it took itself in the
+    seconds item, which is used to time code run in a subprocess without the
+    startup of the interpreter.
+    """
+
+    def run(
+        name: str, func: Callable[[], Any], *, rows: int, rounds: int = 3, self_timed: bool = False
+    ) -> BenchmarkResult:
+        timings = []
+        value = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            value = func()
+            timings.append(float(value["seconds"]) if self_timed else time.perf_counter() - start)
+        result = BenchmarkResult(name, min(timings), rows, value)
+        _benchmark_results.append(result)
+        return result
+
+    return run
+
+
+@pytest.fixture
+def point_layer() -> QgsVectorLayer:
+    return create_point_layer(100)
+
+
+@pytest.fixture(scope="module")
+def benchmark_layer() -> QgsVectorLayer:
+    return create_point_layer(BENCHMARK_FEATURE_COUNT, "benchmark")
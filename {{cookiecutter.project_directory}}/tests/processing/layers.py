@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsRectangle,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# Number of features in the benchmark layers
+BENCHMARK_FEATURE_COUNT = int(os.environ.get("BENCHMARK_FEATURE_COUNT", "20000"))
+
+POINT_LAYER_URI = "Point?crs=EPSG:3067&field=id:integer&field=value:double&field=name:string(20)"
+
+
+def create_point_layer(feature_count: int, name: str = "points") -> QgsVectorLayer:
+    """Creates a memory point layer with a few attribute columns."""
+    layer = QgsVectorLayer(POINT_LAYER_URI, name, "memory")
+    features = []
+    for i in range(feature_count):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([i, i * 0.5, f"feature {i}"])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(i % 1000, i // 1000)))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+def create_empty_point_layer(name: str = "output") -> QgsVectorLayer:
+    """Creates an empty memory layer with the fields of create_point_layer."""
+    return QgsVectorLayer(POINT_LAYER_URI, name, "memory")
+
+
+def create_wide_geopackage(path: Path, feature_count: int, field_count: int = 40) -> QgsVectorLayer:
+    """Creates a GeoPackage polygon layer with an id column and field_count numeric columns."""
+    fields = QgsFields()
+    fields.append(QgsField("id", QVariant.Int))
+    for i in range(field_count):
+        fields.append(QgsField(f"column_{i}", QVariant.Double))
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+    writer = QgsVectorFileWriter.create(
+        str(path),
+        fields,
+        QgsWkbTypes.Polygon,
+        QgsCoordinateReferenceSystem("EPSG:3067"),
+        QgsCoordinateTransformContext(),
+        options,
+    )
+    assert writer.hasError() == QgsVectorFileWriter.NoError, writer.errorMessage()
+
+    features = []
+    for i in range(feature_count):
+        feature = QgsFeature(fields)
+        feature.setAttributes([i, *(i * 0.1 + column for column in range(field_count))])
+        x, y = i % 1000, i // 1000
+        feature.setGeometry(QgsGeometry.fromRect(QgsRectangle(x, y, x + 0.9, y + 0.9)))
+        features.append(feature)
+    writer.addFeatures(features)
+    del writer
+
+    return QgsVectorLayer(str(path), "wide", "ogr")
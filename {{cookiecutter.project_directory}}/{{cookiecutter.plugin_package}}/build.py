@@ -2,8 +2,22 @@
 from __future__ import annotations
 
 import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
 
-from qgis_plugin_tools.infrastructure.plugin_maker import PluginMaker
+from qgis_plugin_tools.infrastructure.plugin_maker import PluginMaker, echo
+from qgis_plugin_tools.tools.resources import resources_path
 
 """
 #################################################
@@ -19,12 +33,342 @@ resources = list(glob.glob("**/*.qrc", recursive=True))
 extra_dirs = ["resources"]
 compiled_resources: list[str] = []
 
-PluginMaker(
-    py_files=py_files,
-    ui_files=ui_files,
-    resources=resources,
-    extra_dirs=extra_dirs,
-    compiled_resources=compiled_resources,
-    locales=locales,
-    profile=profile,
-)
+"""
+#################################################
+# Normally you would not need to edit below here
+#################################################
+"""
+
+# The content hashes of the build inputs and the deployed files. Remove it to build and deploy everything again.
+BUILD_MANIFEST = ".build-manifest.json"
+
+
+@dataclass(frozen=True)
+class BuildJob:
+    """A command which compiles the output file from the input files."""
+
+    output: str
+    inputs: tuple[str, ...]
+    command: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """The output and the duration of a finished build job."""
+
+    job: BuildJob
+    duration: float
+    stdout: str
+    stderr: str
+
+
+def run_build_job(job: BuildJob) -> JobResult:
+    """Runs the command of the job, capturing its output so that it can be shown in order."""
+
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(job.command, capture_output=True, text=True, check=False)
+    except OSError as e:
+        return JobResult(job, time.perf_counter() - start, "", str(e))
+    stderr = process.stderr
+    if process.returncode and not stderr:
+        stderr = f"{job.command[0]} exited with code {process.returncode}"
+    return JobResult(job, time.perf_counter() - start, process.stdout, stderr)
+
+
+class BuildGraph:
+    """
+    Build jobs and the dependencies between them.
+
+    A job depends on the jobs which build its inputs, for example the resources
+    depend on the translations when the .qrc file lists the .qm files.
+    """
+
+    def __init__(self, jobs: list[BuildJob]) -> None:
+        self.jobs = jobs
+        builders = {self._key(job.output): job for job in jobs}
+        self.dependencies = {
+            job: [builders[key] for key in map(self._key, job.inputs) if key in builders] for job in jobs
+        }
+        self.ordered = self._topological_order()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def _topological_order(self) -> list[BuildJob]:
+        ordered: list[BuildJob] = []
+        remaining = list(self.jobs)
+        while remaining:
+            ready = [job for job in remaining if all(dependency in ordered for dependency in self.dependencies[job])]
+            if not ready:
+                msg = f"The build jobs of {', '.join(job.output for job in remaining)} depend on each other!"
+                raise ValueError(msg)
+            ordered.extend(ready)
+            remaining = [job for job in remaining if job not in ready]
+        return ordered
+
+    def critical_path(self, durations: dict[BuildJob, float]) -> list[BuildJob]:
+        """Returns the chain of dependent jobs which took the longest time in total."""
+
+        def total(path: list[BuildJob]) -> float:
+            return sum(durations.get(job, 0.0) for job in path)
+
+        paths: dict[BuildJob, list[BuildJob]] = {}
+        for job in self.ordered:
+            longest = max((paths[dependency] for dependency in self.dependencies[job]), key=total, default=[])
+            paths[job] = [*longest, job]
+        return max((paths[job] for job in self.jobs), key=total, default=[])
+
+
+def qrc_files(qrc_file: str) -> list[str]:
+    """Returns the files listed in the Qt resource collection file."""
+
+    directory = Path(qrc_file).parent
+    content = Path(qrc_file).read_text(encoding="utf-8")
+    return [(directory / name.strip()).as_posix() for name in re.findall(r"<file[^>]*>([^<]+)</file>", content)]
+
+
+class BuildManifest:
+    """
+    Content hashes of the files used in the build.
+
+    The size and the modification time of each file is stored with its hash,
+    so that the files which have not changed are not read again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            content = {}
+        self._hashes: dict[str, dict[str, Any]] = content.get("hashes", {})
+        self._outputs: dict[str, dict[str, Any]] = content.get("outputs", {})
+        self._deployed: dict[str, dict[str, str]] = content.get("deployed", {})
+
+    def file_hash(self, path: str) -> str:
+        """Returns the hash of the content of the file, or an empty string if it does not exist."""
+
+        key = Path(path).as_posix()
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            return ""
+        cached = self._hashes.get(key)
+        if cached is not None and (cached["size"], cached["mtime_ns"]) == (status.st_size, status.st_mtime_ns):
+            return cached["sha256"]
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        self._hashes[key] = {"size": status.st_size, "mtime_ns": status.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def _input_hashes(self, job: BuildJob) -> dict[str, str]:
+        return {Path(path).as_posix(): self.file_hash(path) for path in job.inputs}
+
+    def is_up_to_date(self, job: BuildJob) -> bool:
+        """Returns whether the output of the job was built with the same command from the same inputs."""
+
+        built = self._outputs.get(Path(job.output).as_posix())
+        return (
+            built is not None
+            and Path(job.output).exists()
+            and built["command"] == list(job.command)
+            and built["inputs"] == self._input_hashes(job)
+        )
+
+    def record_build(self, job: BuildJob) -> None:
+        self._outputs[Path(job.output).as_posix()] = {"command": list(job.command), "inputs": self._input_hashes(job)}
+
+    def forget_builds(self) -> None:
+        self._outputs.clear()
+
+    def deployed_files(self, target_directory: str) -> dict[str, str]:
+        """Returns the hashes of the files deployed to the directory."""
+
+        return self._deployed.get(target_directory, {})
+
+    def record_deployment(self, target_directory: str, deployed_files: dict[str, str]) -> None:
+        self._deployed[target_directory] = deployed_files
+
+    def save(self) -> None:
+        content = {"hashes": self._hashes, "outputs": self._outputs, "deployed": self._deployed}
+        self.path.write_text(json.dumps(content, indent=2, sort_keys=True), encoding="utf-8")
+
+
+class IncrementalPluginMaker(PluginMaker):
+    """
+    PluginMaker which compiles and deploys only the files changed since the previous build.
+
+    The resources are compiled again when the .qrc file or a file it lists
+    has changed, and the translations when the .ts file has changed. Only
+    the changed files are copied to the QGIS profile directory, and the
+    files removed from the plugin are removed from there.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.manifest = BuildManifest(Path(BUILD_MANIFEST))
+        try:
+            # Runs the command given on the command line
+            super().__init__(*args, **kwargs)
+        finally:
+            self.manifest.save()
+
+    def resource_jobs(self) -> list[BuildJob]:
+        jobs = []
+        for fil in self.resources:
+            if not os.path.exists(fil):
+                msg = f"The expected resource file {fil} is missing!"
+                raise ValueError(msg)
+            output = fil.replace(".qrc", ".py")
+            command = (*self._get_platform_args(), self.pyrcc, "-o", output, fil)
+            jobs.append(BuildJob(output, (fil, *qrc_files(fil)), command))
+        return jobs
+
+    def translation_jobs(self) -> list[BuildJob]:
+        jobs = []
+        for locale in self.locales:
+            ts_file = resources_path("i18n", f"{locale}.ts")
+            command = (*self._get_platform_args(), self.lrelease, ts_file)
+            jobs.append(BuildJob(str(Path(ts_file).with_suffix(".qm")), (ts_file,), command))
+        return jobs
+
+    @staticmethod
+    def max_workers() -> int:
+        parser = ArgumentParser()
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of compilation commands to run at the same time (default: number of CPUs)",
+        )
+        args = parser.parse_args(sys.argv[2:])
+        return max(args.jobs, 1)
+
+    def run_jobs(self, jobs: list[BuildJob]) -> None:
+        """
+        Runs the jobs which are not up to date, the independent ones at the same time.
+
+        The output of the commands is shown in the order of the jobs when all
+        of them have finished, followed by the duration of each job and the
+        critical path, the chain of dependent jobs which took the longest.
+        """
+
+        graph = BuildGraph(jobs)
+        max_workers = self.max_workers()
+        start = time.perf_counter()
+        results, up_to_date = self.execute(graph, max_workers)
+
+        for job in graph.jobs:
+            if job in results:
+                echo(" ".join(job.command))
+                echo(results[job].stdout)
+        self.report(graph, results, up_to_date, time.perf_counter() - start, max_workers)
+        for job in graph.jobs:
+            if job in results and results[job].stderr:
+                echo(results[job].stderr, force=True)
+                msg = "Stopping now due to error in stderr!"
+                raise ValueError(msg)
+
+    def execute(self, graph: BuildGraph, max_workers: int) -> tuple[dict[BuildJob, JobResult], list[BuildJob]]:
+        """Runs the jobs of the graph and returns their results and the jobs which were up to date."""
+
+        results: dict[BuildJob, JobResult] = {}
+        up_to_date: list[BuildJob] = []
+        pending = list(graph.ordered)
+        running: dict[Future[JobResult], BuildJob] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                if any(result.stderr for result in results.values()):
+                    # Let the running jobs finish, but do not start new ones
+                    pending.clear()
+                blocked = {*pending, *running.values()}
+                for job in [job for job in pending if blocked.isdisjoint(graph.dependencies[job])]:
+                    pending.remove(job)
+                    if self.manifest.is_up_to_date(job):
+                        up_to_date.append(job)
+                    else:
+                        running[executor.submit(run_build_job, job)] = job
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    result = future.result()
+                    results[result.job] = result
+                    if not result.stderr:
+                        self.manifest.record_build(result.job)
+        return results, up_to_date
+
+    @staticmethod
+    def report(
+        graph: BuildGraph,
+        results: dict[BuildJob, JobResult],
+        up_to_date: list[BuildJob],
+        elapsed: float,
+        max_workers: int,
+    ) -> None:
+        for job in graph.jobs:
+            if job in up_to_date:
+                echo(f"{job.output} is up to date")
+        if not results:
+            return
+        critical_path = graph.critical_path({job: result.duration for job, result in results.items()})
+        echo(
+            f"Built {len(results)} of {len(graph.jobs)} files in {elapsed:.2f} s with {max_workers} workers", force=True
+        )
+        for job in graph.jobs:
+            if job in results:
+                marker = "  (critical path)" if job in critical_path else ""
+                echo(f"{results[job].duration:8.2f} s  {job.output}{marker}", force=True)
+        total = sum(results[job].duration for job in critical_path if job in results)
+        echo(f"Critical path: {' -> '.join(job.output for job in critical_path)} ({total:.2f} s)", force=True)
+
+    def clean(self) -> None:
+        super().clean()
+        self.manifest.forget_builds()
+
+    def compile(self) -> None:
+        self.run_jobs(self.resource_jobs())
+
+    def transcompile(self) -> None:
+        self.run_jobs(self.translation_jobs())
+
+    def build(self) -> None:
+        """Compiles the resources and the translations at the same time."""
+
+        self.run_jobs([*self.resource_jobs(), *self.translation_jobs()])
+
+    def deploy(self) -> None:
+        self.compile()
+        files = [*self.extras, *self.compiled_resources, *self.py_files, *self.ui_files]
+        for directory in self.extra_dirs:
+            files.extend(str(path) for path in sorted(Path(directory).rglob("*")) if path.is_file())
+
+        target_directory = Path(self.plugin_dir)
+        previously_deployed = self.manifest.deployed_files(self.plugin_dir)
+        deployed: dict[str, str] = {}
+        for key in dict.fromkeys(Path(fil).as_posix() for fil in files):
+            deployed[key] = self.manifest.file_hash(key)
+            destination = target_directory / key
+            if previously_deployed.get(key) == deployed[key] and destination.exists():
+                continue
+            echo(f"cp {key} {destination}")
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(key, destination)
+        for key in sorted(previously_deployed.keys() - deployed.keys()):
+            echo(f"rm {target_directory / key}")
+            (target_directory / key).unlink(missing_ok=True)
+        self.manifest.record_deployment(self.plugin_dir, deployed)
+
+
+if __name__ == "__main__":
+    IncrementalPluginMaker(
+        py_files=py_files,
+        ui_files=ui_files,
+        resources=resources,
+        extra_dirs=extra_dirs,
+        compiled_resources=compiled_resources,
+        locales=locales,
+        profile=profile,
+    )
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from qgis.core import QgsExpression, QgsFeatureRequest
+
+if TYPE_CHECKING:
+    from qgis.core import QgsFields, QgsRectangle
+
+
+@dataclass(frozen=True)
+class FeatureRequirements:
+    """
+    Declares which parts of the input features an algorithm needs.
+
+    build_request turns the declaration into the narrowest possible
+    QgsFeatureRequest, so that the data provider reads and decodes only the
+    needed columns and rows. This matters most with wide tables in
+    databases and GeoPackages.
+
+    :param fields: Names of the needed attributes. None reads all attributes.
+    :param geometry: Whether the geometries are needed.
+    :param extent: Only features intersecting this extent are read. The
+        extent is in the CRS of the source.
+    :param expression: Only features matching this expression are read.
+    """
+
+    fields: tuple[str, ...] | None = None
+    geometry: bool = True
+    extent: QgsRectangle | None = None
+    expression: str | None = None
+
+    def build_request(self, source_fields: QgsFields) -> QgsFeatureRequest:
+        request = QgsFeatureRequest()
+        has_extent = self.extent is not None and not self.extent.isNull()
+
+        expression = QgsExpression(self.expression) if self.expression else None
+        referenced_columns = set(expression.referencedColumns()) if expression is not None else set()
+        if expression is not None:
+            request.setFilterExpression(self.expression)
+
+        if self.fields is not None and QgsFeatureRequest.ALL_ATTRIBUTES not in referenced_columns:
+            request.setSubsetOfAttributes(sorted(set(self.fields) | referenced_columns), source_fields)
+
+        if has_extent:
+            request.setFilterRect(self.extent)
+
+        geometry_needed = self.geometry or has_extent or (expression is not None and expression.needsGeometry())
+        if not geometry_needed:
+            request.setFlags(request.flags() | QgsFeatureRequest.NoGeometry)
+
+        return request
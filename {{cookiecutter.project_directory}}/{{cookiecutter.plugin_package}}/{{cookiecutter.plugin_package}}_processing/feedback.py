@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from qgis.core import QgsProcessingFeedback
+
+# Seconds after which the progress is reported even if the percentage has not changed
+DEFAULT_PROGRESS_INTERVAL = 1.0
+
+# Seconds between checks of the cancellation state of the wrapped feedback
+DEFAULT_CANCEL_INTERVAL = 0.1
+
+
+class ThrottledFeedback:
+    """
+    Feedback wrapper that limits how often progress and cancellation are passed on.
+
+    When QGIS runs an algorithm in the GUI, every progress update is sent
+    across threads to the algorithm dialog. This wrapper passes the progress
+    on only when its integer percentage changes or when progress_interval
+    seconds have passed since the last update, and checks the cancellation
+    state of the wrapped feedback at most every cancel_interval seconds.
+    The progress is also used to estimate the throughput and the remaining
+    time of the algorithm.
+
+    The wrapper can be used wherever Python code expects a
+    QgsProcessingFeedback, all other methods are passed to the wrapped
+    feedback as they are. Pass the wrapped feedback attribute to QGIS
+    functions, such as processing.run, that need a real QgsProcessingFeedback.
+
+    ```py
+    feedback = ThrottledFeedback(feedback, total=source.featureCount())
+    for count, feature in enumerate(source.getFeatures()):
+        if feedback.isCanceled():
+            break
+        ...
+        feedback.set_processed(count + 1)
+    feedback.push_summary()
+    ```
+    """
+
+    def __init__(
+        self,
+        feedback: QgsProcessingFeedback,
+        *,
+        total: int = 0,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+        cancel_interval: float = DEFAULT_CANCEL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param feedback: Feedback to pass the throttled calls to.
+        :param total: Number of features processed by the algorithm, if known.
+            Needed for set_processed and for the throughput estimate.
+        :param progress_interval: Seconds after which the progress is passed on
+            even if its integer percentage has not changed.
+        :param cancel_interval: Seconds between checks of the cancellation state.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.feedback = feedback
+        self.total = total
+        self.progress_interval = progress_interval
+        self.cancel_interval = cancel_interval
+        self._clock = clock
+
+        self._started_at = clock()
+        self._progress = 0.0
+        self._processed: int | None = None
+        self._reported_percentage = -1
+        self._reported_at = -math.inf
+        self._canceled = False
+        self._cancel_checked_at = -math.inf
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.feedback, name)
+
+    def setProgress(self, progress: float) -> None:  # noqa N802
+        """Sets the progress as a percentage and passes it on if it is due."""
+        self._progress = progress
+        percentage = int(progress)
+        if percentage == self._reported_percentage:
+            now = self._clock()
+            if now - self._reported_at < self.progress_interval:
+                return
+        else:
+            now = self._clock()
+        self._reported_percentage = percentage
+        self._reported_at = now
+        self.feedback.setProgress(progress)
+
+    def progress(self) -> float:
+        return self._progress
+
+    def set_processed(self, processed: int) -> None:
+        """Sets the progress from the number of processed features out of the total."""
+        self._processed = processed
+        if self.total > 0:
+            self.setProgress(100.0 * processed / self.total)
+
+    def isCanceled(self) -> bool:  # noqa N802
+        """Returns the cancellation state, which is refreshed at most every cancel_interval seconds."""
+        if self._canceled:
+            return True
+        now = self._clock()
+        if now - self._cancel_checked_at >= self.cancel_interval:
+            self._cancel_checked_at = now
+            self._canceled = self.feedback.isCanceled()
+        return self._canceled
+
+    def cancel(self) -> None:
+        self._canceled = True
+        self.feedback.cancel()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the wrapper was created."""
+        return self._clock() - self._started_at
+
+    @property
+    def processed(self) -> int | None:
+        """Number of processed features, or None if neither it nor the total is known."""
+        if self._processed is not None:
+            return self._processed
+        if self.total > 0:
+            return round(self.total * self._progress / 100)
+        return None
+
+    @property
+    def throughput(self) -> float | None:
+        """Processed features per second, or None if not known yet."""
+        elapsed = self.elapsed
+        processed = self.processed
+        if processed is None or elapsed <= 0:
+            return None
+        return processed / elapsed
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds until the progress reaches 100 %, or None if not known yet."""
+        if self._progress <= 0:
+            return None
+        return self.elapsed * (100 - min(self._progress, 100)) / self._progress
+
+    def summary(self) -> str:
+        """Returns a short description of the elapsed time and the throughput."""
+        text = f"Finished in {self.elapsed:.1f} s"
+        processed = self.processed
+        throughput = self.throughput
+        if processed is not None and throughput is not None:
+            text += f", {processed} features ({throughput:.0f} features/s)"
+        return text
+
+    def push_summary(self) -> None:
+        """Writes the summary to the log of the wrapped feedback."""
+        self.feedback.pushInfo(self.summary())